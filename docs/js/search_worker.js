@@ -0,0 +1,315 @@
+// Search worker for the sharded search index written by scripts/search_shards.py, in place of Material's.
+// It answers the same messages as Material's worker (setup, ready, query, result), but instead of building a lunr
+// index from every document, it loads the term shards of the first letters of the query terms, and the document
+// shards of the results it returns.
+
+var SETUP = 0, READY = 1, QUERY = 2, RESULT = 3;
+var MAX_RESULTS = 50;
+
+var root = new URL("..", self.location.href);
+var manifest = null;
+var separator = /[\s\-]+/;
+var stopWords = new Set();
+var stemmed = false;
+var shards = new Map();
+var pending = Promise.resolve();
+
+function load(name) {
+  if (!shards.has(name)) {
+    var url = new URL(manifest.path + name, root);
+    shards.set(name, fetch(url).then(function (response) {
+      if (!response.ok) {
+        shards.delete(name);
+        throw new Error("Could not load " + url + ": " + response.status);
+      }
+      return response.json();
+    }));
+  }
+  return shards.get(name);
+}
+
+// Same as lunr's trimmer, and the tokenizer of search_shards.py
+function trim(token) {
+  return token.replace(/^\W+|\W+$/g, "");
+}
+
+// lunr's Porter stemmer, the same port as stem() in search_shards.py, which stems the terms of the index alike
+var step2Suffixes = {
+  ational: "ate", tional: "tion", enci: "ence", anci: "ance", izer: "ize", bli: "ble", alli: "al", entli: "ent",
+  eli: "e", ousli: "ous", ization: "ize", ation: "ate", ator: "ate", alism: "al", iveness: "ive", fulness: "ful",
+  ousness: "ous", aliti: "al", iviti: "ive", biliti: "ble", logi: "log"
+};
+var step3Suffixes = {icate: "ic", ative: "", alize: "al", iciti: "ic", ical: "ic", ful: "", ness: ""};
+var consonants = "[^aeiou][^aeiouy]*", vowels = "[aeiouy][aeiou]*";
+var measureGt0 = new RegExp("^(" + consonants + ")?" + vowels + consonants);
+var measureEq1 = new RegExp("^(" + consonants + ")?" + vowels + consonants + "(" + vowels + ")?$");
+var measureGt1 = new RegExp("^(" + consonants + ")?" + vowels + consonants + vowels + consonants);
+var hasVowel = new RegExp("^(" + consonants + ")?[aeiouy]");
+var step1a = /^(.+?)(ss|i)es$/, step1aS = /^(.+?)([^s])s$/;
+var step1bEed = /^(.+?)eed$/, step1b = /^(.+?)(ed|ing)$/, step1bE = /(at|bl|iz)$/;
+var doubleConsonant = /([^aeiouylsz])\1$/;
+var cvc = new RegExp("^" + consonants + "[aeiouy][^aeiouwxy]$");
+var step1c = /^(.+?[^aeiou])y$/;
+var step2 = new RegExp("^(.+?)(" + Object.keys(step2Suffixes).join("|") + ")$");
+var step3 = new RegExp("^(.+?)(" + Object.keys(step3Suffixes).join("|") + ")$");
+var step4 = /^(.+?)(al|ance|ence|er|ic|able|ible|ant|ement|ment|ent|ou|ism|ate|iti|ous|ive|ize)$/;
+var step4Ion = /^(.+?)(s|t)(ion)$/;
+var step5 = /^(.+?)e$/;
+
+function stem(word) {
+  if (word.length < 3)
+    return word;
+  // A leading y is a consonant
+  var first = word[0], match;
+  if (first === "y")
+    word = "Y" + word.slice(1);
+
+  if ((match = step1a.exec(word)) || (match = step1aS.exec(word)))
+    word = match[1] + match[2];
+
+  if ((match = step1bEed.exec(word))) {
+    if (measureGt0.test(match[1]))
+      word = word.slice(0, -1);
+  } else if ((match = step1b.exec(word)) && hasVowel.test(match[1])) {
+    word = match[1];
+    if (step1bE.test(word) || (!doubleConsonant.test(word) && cvc.test(word)))
+      word += "e";
+    else if (doubleConsonant.test(word))
+      word = word.slice(0, -1);
+  }
+
+  if ((match = step1c.exec(word)))
+    word = match[1] + "i";
+
+  if ((match = step2.exec(word)) && measureGt0.test(match[1]))
+    word = match[1] + step2Suffixes[match[2]];
+
+  if ((match = step3.exec(word)) && measureGt0.test(match[1]))
+    word = match[1] + step3Suffixes[match[2]];
+
+  if ((match = step4.exec(word))) {
+    if (measureGt1.test(match[1]))
+      word = match[1];
+  } else if ((match = step4Ion.exec(word)) && measureGt1.test(match[1] + match[2])) {
+    word = match[1] + match[2];
+  }
+
+  if ((match = step5.exec(word)) && (measureGt1.test(match[1]) || (measureEq1.test(match[1]) && !cvc.test(match[1]))))
+    word = match[1];
+
+  if (/ll$/.test(word) && measureGt1.test(word))
+    word = word.slice(0, -1);
+
+  if (first === "y")
+    word = "y" + word.slice(1);
+  return word;
+}
+
+// The query syntax of Material's search: plain terms match every term that starts with them, `+term` has to be in
+// a result, `-term` must not be, and the words of "a phrase" all have to be in a result
+function parseQuery(query) {
+  var terms = [];
+  var words = query.trim().split(/"([^"]+)"/g).map(function (part, index) {
+    return index & 1 ? part.trim().split(/\s+/).map(function (word) { return "+" + word; }).join(" ") : part;
+  }).join(" ").split(/\s+/);
+  for (var word of words) {
+    var presence = /^[+-]/.test(word) ? word[0] : "";
+    word = word.replace(/^[+-]+/, "").replace(/^(title|text|tags):/, "").replace(/[~^]\d*$/, "").replace(/\*/g, "");
+    for (var token of word.toLowerCase().split(separator)) {
+      token = trim(token);
+      if (token && !(presence !== "-" && stopWords.has(token)))
+        terms.push({term: stemmed ? stem(token) : token, word: token, presence: presence, prefix: presence === ""});
+    }
+  }
+  return terms;
+}
+
+// The prefix of the shard a term is in: the longest prefix in the manifest that the term starts with
+function shardPrefix(term) {
+  for (var length = term.length; length > 0; length--)
+    if (manifest.terms.hasOwnProperty(term.slice(0, length)))
+      return term.slice(0, length);
+  return null;
+}
+
+// The shards with the terms that match a query term
+function termShards(query) {
+  var names = new Set();
+  var prefix = shardPrefix(query.term);
+  if (prefix !== null)
+    names.add(manifest.term_files[manifest.terms[prefix]]);
+  // Longer prefixes are split into shards of their own
+  if (query.prefix)
+    for (var key in manifest.terms)
+      if (key.length > query.term.length && key.startsWith(query.term))
+        names.add(manifest.term_files[manifest.terms[key]]);
+  return Array.from(names);
+}
+
+// The scores of the documents that contain a query term, and the term that matches it best
+async function match(query) {
+  var scores = new Map();
+  var best = null, bestCount = 0;
+  var loaded = await Promise.all(termShards(query).map(load));
+  for (var shard of loaded) {
+    for (var term in shard) {
+      if (term !== query.term && !(query.prefix && term.startsWith(query.term)))
+        continue;
+      var postings = shard[term];
+      // Like lunr, a term that only starts with the query term counts less than the term itself
+      var weight = term === query.term ? 1 : 0.5;
+      for (var i = 0; i < postings.length; i += 2)
+        scores.set(postings[i], Math.max(scores.get(postings[i]) || 0, postings[i + 1] * weight));
+      if (postings.length > bestCount) {
+        best = term;
+        bestCount = postings.length;
+      }
+    }
+  }
+  return {scores: scores, best: best};
+}
+
+async function documents(ids) {
+  var names = new Set();
+  var ranges = manifest.docs;
+  for (var id of ids) {
+    var index = ranges.length - 1;
+    while (index > 0 && ranges[index][0] > id)
+      index--;
+    names.add(index);
+  }
+  var result = new Map();
+  await Promise.all(Array.from(names).map(async function (index) {
+    var first = ranges[index][0];
+    var entries = await load(ranges[index][1]);
+    entries.forEach(function (entry, offset) { result.set(first + offset, entry); });
+  }));
+  return result;
+}
+
+function escapeRegExp(value) {
+  return value.replace(/[.*+?^${}()|[\]\\]/g, "\\$&");
+}
+
+// Mark the words that start with a matched term, outside of tags and entities
+function highlight(value, terms) {
+  if (!terms.length)
+    return value;
+  var pattern = new RegExp("(^|[^\\p{L}\\p{N}_])(" + terms.map(escapeRegExp).join("|") + ")", "giu");
+  return value.split(/(<[^>]*>|&[#\w]+;)/).map(function (part, index) {
+    return index & 1 ? part : part.replace(pattern, "$1<mark>$2</mark>");
+  }).join("");
+}
+
+async function search(query) {
+  var terms = parseQuery(query);
+  if (!terms.length)
+    return {items: []};
+  var matches = await Promise.all(terms.map(match));
+
+  var scores = new Map(), found = new Map();
+  terms.forEach(function (query, index) {
+    if (query.presence === "-")
+      return;
+    matches[index].scores.forEach(function (score, id) {
+      scores.set(id, (scores.get(id) || 0) + score);
+      found.set(id, (found.get(id) || new Set()).add(query.term));
+    });
+  });
+  terms.forEach(function (query, index) {
+    var hits = matches[index].scores;
+    if (query.presence === "-")
+      hits.forEach(function (score, id) { scores.delete(id); });
+    else if (query.presence === "+")
+      scores.forEach(function (score, id) {
+        if (!hits.has(id))
+          scores.delete(id);
+      });
+  });
+
+  // Documents with the best score first, grouped by page, like Material's search
+  var ranked = Array.from(scores.entries()).sort(function (a, b) { return b[1] - a[1]; });
+  var entries = await documents(ranked.map(function (item) { return item[0]; }).slice(0, MAX_RESULTS * 4));
+  var groups = new Map();
+  for (var [id, score] of ranked) {
+    var entry = entries.get(id);
+    if (entry === undefined)
+      continue;
+    var page = entry[3] >= 0 ? entry[3] : id;
+    if (!groups.has(page)) {
+      if (groups.size === MAX_RESULTS)
+        continue;
+      groups.set(page, new Map());
+    }
+    groups.get(page).set(id, score);
+  }
+  var pages = await documents(Array.from(groups.keys()));
+
+  var items = [];
+  groups.forEach(function (group, page) {
+    if (!group.has(page) && pages.has(page))
+      group.set(page, 0);
+    var result = [];
+    group.forEach(function (score, id) {
+      var entry = id === page ? pages.get(page) : entries.get(id);
+      var matched = Array.from(found.get(id) || []);
+      // A stem does not always start the words it is the stem of ("studi" of "study"), so the query words are marked too
+      var marked = matched.concat(terms.filter(function (query) {
+        return query.presence !== "-" && matched.indexOf(query.term) >= 0;
+      }).map(function (query) { return query.word; }));
+      var item = {
+        location: entry[0],
+        title: highlight(entry[1], marked),
+        text: highlight(entry[2], marked),
+        score: score,
+        terms: {}
+      };
+      // Pages that are only shown for their sections have no terms, like in Material's search
+      if (score > 0)
+        terms.forEach(function (query) {
+          if (query.presence !== "-")
+            item.terms[query.word] = matched.indexOf(query.term) >= 0;
+        });
+      if (entry[4])
+        item.tags = entry[4];
+      result.push(item);
+    });
+    items.push(result);
+  });
+
+  var last = terms[terms.length - 1];
+  var best = matches[terms.length - 1].best;
+  var result = {items: items};
+  if (last.prefix && best)
+    result.suggest = [best];
+  return result;
+}
+
+async function handle(message) {
+  switch (message.type) {
+    case SETUP:
+      manifest = message.data.config.shards;
+      separator = new RegExp(message.data.config.separator);
+      stopWords = new Set(manifest.stop_words);
+      stemmed = manifest.stemmer;
+      return {type: READY};
+    case QUERY:
+      try {
+        return {type: RESULT, data: await search(message.data)};
+      } catch (error) {
+        console.warn("Search failed: " + message.data, error);
+        return {type: RESULT, data: {items: []}};
+      }
+    default:
+      throw new TypeError("Invalid message type");
+  }
+}
+
+// Answered in order, so the results of a query never replace those of a later one
+self.addEventListener("message", function (event) {
+  pending = pending.then(function () {
+    return handle(event.data);
+  }).then(function (reply) {
+    self.postMessage(reply);
+  });
+});
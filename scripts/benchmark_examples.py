@@ -0,0 +1,190 @@
+"""
+Benchmark the example scripts in docs/examples, to catch examples that get slower before they slow down the docs build.
+
+The examples run one at a time, like run_examples.py does, but against recorded responses of the OpenML server
+(see http_replay.py) and with an empty openml-python cache, so the numbers do not depend on the network and can
+be compared across commits. Record the responses once (this uses the live server), then benchmark:
+
+    python scripts/benchmark_examples.py --record
+    python scripts/benchmark_examples.py
+    python scripts/benchmark_examples.py 40_paper/2018_kdd_rijn_example.py --repeat 3 --compare main
+
+For every example this reports the wall time, CPU time and peak RSS of the kernel, and the number of requests,
+API calls and bytes downloaded. The report is written to .cache/benchmarks/<commit>.json. With `--compare`,
+the results are compared to the report of another commit (or a report file), and the script fails when an
+example got slower, used more memory or downloaded more than `--threshold` allows.
+"""
+
+from datetime import datetime
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import run_examples
+
+output_dir = run_examples.root / ".cache" / "benchmarks"
+
+# metric: (minimum absolute change that counts as a regression, format)
+metrics = {
+    "wall_time_s": (1.0, "{:.1f}s"),
+    "cpu_time_s": (1.0, "{:.1f}s"),
+    "peak_rss_mb": (50, "{:.0f} MB"),
+    "requests": (0, "{:.0f}"),
+    "api_calls": (0, "{:.0f}"),
+    "bytes_downloaded": (0, "{:,.0f} B"),
+}
+
+
+def git(*args: str) -> str:
+    return subprocess.run(["git", *args], cwd=run_examples.root, capture_output=True, text=True).stdout.strip()
+
+
+def current_commit() -> str:
+    commit = git("rev-parse", "HEAD")[:12] or "unknown"
+    # Only tracked files count, the docs folders contain imported files
+    changed = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=run_examples.root).returncode != 0
+    return f"{commit}-dirty" if changed else commit
+
+
+def benchmark_example(example: Path, args) -> dict:
+    """
+    Run an example `args.repeat` times and return the median of every metric.
+    """
+    runs = []
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = Path(tmp_dir) / "executed.ipynb"
+            # A fresh cache directory for openml-python, so every run downloads what it needs
+            env = {"XDG_CACHE_HOME": str(Path(tmp_dir) / "cache")}
+            result = run_examples.run_in_worker(
+                example, output, args.timeout, args.memory_limit, args.http_mode, args.latency, env
+            )
+        http = result.get("http", {})
+        runs.append({
+            "status": result["status"],
+            "error": result.get("error"),
+            "wall_time_s": result["wall_time_s"],
+            "cpu_time_s": result.get("cpu_time_s"),
+            "peak_rss_mb": result.get("peak_rss_mb"),
+            "requests": http.get("requests"),
+            "api_calls": http.get("api_calls"),
+            "bytes_downloaded": http.get("bytes_downloaded"),
+            "missing_fixtures": http.get("missing", 0),
+        })
+        if result["status"] != "ok":
+            return runs[-1]
+    summary = {"status": "ok", "runs": len(runs)}
+    for metric in metrics:
+        values = [run[metric] for run in runs if run[metric] is not None]
+        summary[metric] = statistics.median_low(values) if values else None
+    return summary
+
+
+def load_report(reference: str) -> dict:
+    """
+    The report of a commit (any name git understands, e.g. `main` or `HEAD~1`) or a report file.
+    """
+    path = Path(reference)
+    if not path.exists():
+        commit = git("rev-parse", "--verify", "--quiet", f"{reference}^{{commit}}")[:12]
+        path = output_dir / f"{commit or reference}.json"
+    if not path.exists():
+        sys.exit(f"No benchmark report for {reference}, benchmark that commit first")
+    return json.loads(path.read_text())
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Print the change of every metric against the baseline, and return the regressions.
+    """
+    regressions = []
+    print(f"\nCompared to {baseline['commit']} ({baseline['started_at']}):")
+    for name, result in report["examples"].items():
+        before = baseline["examples"].get(name)
+        if before is None:
+            continue
+        if result["status"] != "ok":
+            if before["status"] == "ok":
+                regressions.append(f"{name}: {result['status']}, was ok")
+            continue
+        if before["status"] != "ok":
+            continue
+        changes = []
+        for metric, (min_change, fmt) in metrics.items():
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (1.0 if new else 0.0)
+            changes.append(f"{metric} {change:+.0%}")
+            if change > threshold and new - old > min_change:
+                regressions.append(f"{name}: {metric} {fmt.format(old)} -> {fmt.format(new)} ({change:+.0%})")
+        print(f"  {name:<55} {', '.join(changes)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("examples", nargs="*", help="Examples to run, relative to docs/examples (default: all)")
+    parser.add_argument("--record", action="store_true", help="Record the responses of the live server first")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per example, the median is reported")
+    parser.add_argument("--timeout", type=int, default=900, help="Time limit per example, in seconds")
+    parser.add_argument("--memory-limit", type=int, default=4096, help="Memory limit per example in MB, 0 for none")
+    parser.add_argument("--latency", type=float, default=0.0, help="Multiple of the recorded response times to wait")
+    parser.add_argument("--compare", metavar="COMMIT", help="Commit or report file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative increase that counts as a regression")
+    args = parser.parse_args()
+    args.http_mode = "replay"
+
+    examples = run_examples.find_examples(args.examples)
+    if not examples:
+        sys.exit("No examples found")
+
+    if args.record:
+        print(f"Recording the responses of {len(examples)} examples")
+        record_args = argparse.Namespace(**{**vars(args), "http_mode": "record", "repeat": 1})
+        for example in examples:
+            result = benchmark_example(example, record_args)
+            print(f"  {example.relative_to(run_examples.examples_dir).as_posix():<55} {result['status']}")
+
+    report = {
+        "commit": current_commit(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "examples": {},
+    }
+    print(f"{'example':<55} {'status':<8} {'wall':>7} {'cpu':>7} {'peak RSS':>9} {'calls':>6} {'downloaded':>12}")
+    for example in examples:
+        name = example.relative_to(run_examples.examples_dir).as_posix()
+        result = report["examples"][name] = benchmark_example(example, args)
+        if result["status"] != "ok":
+            hint = " (missing recorded responses, run with --record)" if result.get("missing_fixtures") else ""
+            print(f"{name:<55} {result['status']}{hint}")
+            continue
+        print(
+            f"{name:<55} {result['status']:<8} {result['wall_time_s']:>6.1f}s {result['cpu_time_s'] or 0:>6.1f}s "
+            f"{result['peak_rss_mb'] or 0:>6.0f} MB {result['api_calls'] or 0:>6} {run_examples.format_bytes(result['bytes_downloaded'] or 0):>12}"
+        )
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report_file = output_dir / f"{report['commit']}.json"
+    report_file.write_text(json.dumps(report, indent=2))
+    print(f"Report written to {report_file}")
+
+    if args.compare:
+        regressions = compare(report, load_report(args.compare), args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark the streaming GitHub page parser of github_scraper.py against the full BeautifulSoup parse.
+
+By default the saved repository pages in fixtures/github_pages are used. Saved .html files, the scraper's response
+cache (.cache/showcase), or folders containing them, can be passed instead:
+
+    python benchmark_github_parsing.py
+    python benchmark_github_parsing.py ../.cache/showcase --repeat 10
+    python benchmark_github_parsing.py --check
+
+Every fixture is checked to give the same result with both parsers before it is timed, `--check` only does that
+and exits with an error when they differ. `--save-fixtures` replaces the fixtures with the pages in the response
+cache, after a run of github_scraper.py.
+"""
+
+from pathlib import Path
+from urllib.parse import urlsplit
+import argparse
+import json
+import re
+import sys
+import timeit
+
+import github_scraper
+
+fixtures_dir = Path(__file__).parent / "fixtures" / "github_pages"
+
+
+def load_fixtures(paths:list[Path])->dict[str, str]:
+    """
+    Return a mapping from fixture name to HTML, from cache entries or .html files.
+    """
+    fixtures = {}
+    for path in paths:
+        if not path.exists():
+            continue
+        if path.is_dir():
+            files = sorted([*path.glob("*.html"), *path.glob("*.json")])
+        else:
+            files = [path]
+        for file in files:
+            if file.suffix == ".json":
+                entry = json.loads(file.read_text())
+                if entry.get("body"):
+                    fixtures[entry["url"]] = entry["body"]
+            else:
+                fixtures[file.name] = file.read_text()
+    return fixtures
+
+
+def compare_parsers(html:str)->str|None:
+    """
+    Describe how the streaming parser differs from BeautifulSoup on a page, or return None when they agree.
+    Pages that are not repository pages have to be rejected by both.
+    """
+    try:
+        expected = github_scraper.parse_github_page_soup(html)
+    except ValueError:
+        expected = None
+    result = github_scraper.parse_github_page_fast(html)
+    if result == expected:
+        return None
+    if result is None:
+        return f"streaming parser fell back to BeautifulSoup, which returned {expected}"
+    return f"streaming parser returned {result}, BeautifulSoup returned {expected}"
+
+
+def time_parser(parse, html:str, repeat:int)->float:
+    def run():
+        try:
+            parse(html)
+        except ValueError:  # pages that are not repository pages take the time of being rejected
+            pass
+
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def save_fixtures(cache_dir:Path)->int:
+    """
+    Replace the fixtures with the repository pages in the scraper's response cache, and return how many were saved.
+    """
+    pages = load_fixtures([cache_dir])
+    if not pages:
+        return 0
+    for path in fixtures_dir.glob("*.html"):
+        path.unlink()
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    for url, html in pages.items():
+        name = re.sub(r"[^\w.-]+", "_", urlsplit(url).path.strip("/"))
+        (fixtures_dir / f"{name}.html").write_text(html)
+    return len(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the GitHub page parsers of github_scraper.py")
+    parser.add_argument("paths", nargs="*", type=Path, default=[fixtures_dir])
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed parses per fixture and parser")
+    parser.add_argument("--check", action="store_true", help="Only check that both parsers give the same result")
+    parser.add_argument(
+        "--save-fixtures", action="store_true", help="Replace the fixtures with the pages in the response cache"
+    )
+    args = parser.parse_args()
+
+    if args.save_fixtures:
+        saved = save_fixtures(github_scraper.cache_dir)
+        if not saved:
+            sys.exit("No pages in the response cache, run github_scraper.py first")
+        print(f"Saved {saved} pages to {fixtures_dir}")
+        return
+
+    fixtures = load_fixtures(args.paths)
+    if not fixtures:
+        sys.exit("No fixtures found, pass saved .html files or the response cache of github_scraper.py")
+
+    differences = {name: compare_parsers(html) for name, html in fixtures.items()}
+    differences = {name: difference for name, difference in differences.items() if difference is not None}
+    for name, difference in differences.items():
+        print(f"{name}: {difference}")
+    if differences:
+        sys.exit(f"The parsers differ on {len(differences)} of {len(fixtures)} fixtures")
+    if args.check:
+        print(f"Both parsers agree on all {len(fixtures)} fixtures")
+        return
+
+    print(f"{'fixture':<60} {'KB':>7} {'soup ms':>9} {'fast ms':>9} {'speedup':>8}")
+    total_soup = total_fast = 0.0
+    for name, html in fixtures.items():
+        soup_time = time_parser(github_scraper.parse_github_page_soup, html, args.repeat)
+        fast_time = time_parser(github_scraper.parse_github_page, html, args.repeat)
+        total_soup += soup_time
+        total_fast += fast_time
+        print(f"{name[-60:]:<60} {len(html) / 1024:>7.0f} {soup_time * 1000:>9.1f} {fast_time * 1000:>9.1f} {soup_time / fast_time:>7.1f}x")
+
+    print(f"{'total':<60} {'':>7} {total_soup * 1000:>9.1f} {total_fast * 1000:>9.1f} {total_soup / total_fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
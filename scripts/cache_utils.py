@@ -0,0 +1,35 @@
+"""
+Helpers shared by the hooks and scripts that keep files in .cache.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+import tempfile
+
+# Only for the annotations: the scripts that run outside of mkdocs (and inside the example kernels) import this too
+if TYPE_CHECKING:
+    from mkdocs.structure.toc import AnchorLink
+
+
+def atomic_write(path: Path, data: str | bytes):
+    """
+    Write data to path through a temporary file next to it, so an interrupted write never leaves a broken file and
+    a concurrent reader never sees half of one. Every call gets a temporary file of its own, so threads and
+    processes can write the same path at once.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode()
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False) as file:
+        file.write(data)
+    Path(file.name).replace(path)
+
+
+def toc_to_tokens(items: "list[AnchorLink]") -> list[dict]:
+    """
+    The table of contents of a page as the tokens mkdocs.structure.toc.get_toc builds it from, to store it as JSON.
+    """
+    return [
+        {"level": item.level, "id": item.id, "name": item.title, "children": toc_to_tokens(item.children)}
+        for item in items
+    ]
@@ -0,0 +1,43 @@
+"""
+Show the outputs of the examples in the docs, from the runs stored by run_examples.py.
+
+Registered as a mkdocs hook after notebook_cache.py (see `hooks` in `mkdocs.yml`). When run_examples.py stored a
+successful run of an example for its current source and environment, mkdocs-jupyter converts the executed notebook
+of that run instead of the bare script, so the page shows its printed output and figures. Other examples are
+converted as before.
+"""
+
+from pathlib import Path
+import logging
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+import run_examples
+
+log = logging.getLogger("mkdocs.plugins.example_results")
+
+
+def on_pre_page(page, config, files):
+    # mkdocs-jupyter sets its own render method on the pages it converts
+    render = page.__dict__.get("render")
+    if render is None or not page.file.src_uri.startswith("examples/"):
+        return page
+    source = page.file.abs_src_path
+    result = run_examples.load_result(run_examples.example_key(Path(source)))
+    if result is None or result["status"] != "ok":
+        return page
+    executed = run_examples.object_path(result["notebook"])
+    if not executed.exists():
+        return page
+
+    def render_executed(config, files):
+        # mkdocs-jupyter reads the notebook from the page's source path when it renders
+        page.file.abs_src_path = str(executed)
+        try:
+            render(config, files)
+        finally:
+            page.file.abs_src_path = source
+
+    log.debug(f"Using the outputs of the run of {result['finished_at']} for {page.file.src_uri}")
+    page.render = render_executed
+    return page
@@ -0,0 +1,145 @@
+"""
+Fingerprint the static files of the built site, so browsers and CDNs can cache them forever.
+
+Registered as a mkdocs hook (see `hooks` in `mkdocs.yml`), after the other hooks have written their files. The
+stylesheets, scripts, images and fonts of the site (such as css/extra.css and the images in img/) are served
+under fixed names, so they can only be cached briefly. After the build, this hook
+
+- copies every such file to a name with the hash of its content, next to the original (`extra.css` becomes
+  `extra.1a2b3c4d.css`), so links from outside the site to the original keep working,
+- points the references in the HTML pages (and in the stylesheets, before they are hashed themselves) to those copies,
+- writes a `_headers` file (the format of Netlify and Cloudflare Pages) with an immutable Cache-Control header for
+  the fingerprinted files, the files Material already names by their hash, and the search index shards.
+"""
+
+from pathlib import Path
+from urllib.parse import urlsplit
+import hashlib
+import logging
+import posixpath
+import re
+import shutil
+import time
+
+from mkdocs.plugins import event_priority
+
+log = logging.getLogger("mkdocs.plugins.fingerprint_assets")
+
+fingerprinted_suffixes = {
+    ".css", ".js", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".avif", ".ico", ".woff", ".woff2", ".ttf",
+}
+# Material's assets are named by their hash already, or loaded by scripts under their fixed name
+skipped_folders = ("assets/", "search/")
+# Files that are named by their hash already: Material's assets, the search shards and the copies of this hook
+hashed_name = re.compile(r"\.[0-9a-f]{8,}(?:\.min)?\.\w+$")
+immutable_folders = ["search/shards/"]
+cache_control = "public, max-age=31536000, immutable"
+
+attribute = re.compile(r"""\b(src|href|srcset|poster|content|data-[\w-]+)=("[^"]*"|'[^']*')""", re.IGNORECASE)
+# The search worker in Material's configuration, see search_shards.py
+config_search = re.compile(r"""("search":\s*")([^"]+)(")""")
+css_url = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:8]
+
+
+def is_asset(path: str) -> bool:
+    return (
+        posixpath.splitext(path)[1].lower() in fingerprinted_suffixes
+        and not path.startswith(skipped_folders)
+        and not hashed_name.search(path)
+    )
+
+
+def replace_url(url: str, base: str, renamed: dict[str, str], root_path: str) -> str:
+    """
+    The url with the file name of the fingerprinted copy, when it points to a fingerprinted file. Relative urls are
+    resolved from base, the folder of the referring file in the site.
+    """
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return url
+    if parts.path.startswith("/"):
+        if not parts.path.startswith(root_path):
+            return url
+        target = parts.path[len(root_path):]
+    else:
+        target = posixpath.normpath(posixpath.join(base, parts.path))
+    if target not in renamed:
+        return url
+    name = posixpath.basename(renamed[target])
+    return url[: len(parts.path) - len(posixpath.basename(parts.path))] + name + url[len(parts.path):]
+
+
+def rewrite_html(html: str, base: str, renamed: dict[str, str], root_path: str) -> str:
+    def replace_attribute(match):
+        name, quoted = match.groups()
+        value = quoted[1:-1]
+        if name.lower() == "srcset":
+            candidates = [candidate.strip().split(" ", 1) for candidate in value.split(",")]
+            value = ", ".join(
+                " ".join([replace_url(candidate[0], base, renamed, root_path), *candidate[1:]])
+                for candidate in candidates
+            )
+        else:
+            value = replace_url(value, base, renamed, root_path)
+        return f"{name}={quoted[0]}{value}{quoted[0]}"
+
+    html = attribute.sub(replace_attribute, html)
+    html = config_search.sub(
+        lambda m: m.group(1) + replace_url(m.group(2), base, renamed, root_path) + m.group(3), html, count=1
+    )
+    return rewrite_css(html, base, renamed, root_path)
+
+
+def rewrite_css(css: str, base: str, renamed: dict[str, str], root_path: str) -> str:
+    return css_url.sub(
+        lambda m: f"url({m.group(1)}{replace_url(m.group(2), base, renamed, root_path)}{m.group(1)})", css
+    )
+
+
+def headers_file(paths: list[str], root_path: str) -> str:
+    lines = ["# Written by scripts/fingerprint_assets.py: files that are named by the hash of their content"]
+    for path in paths:
+        lines += [f"{root_path}{path}", f"  Cache-Control: {cache_control}"]
+    return "\n".join(lines) + "\n"
+
+
+# After the hooks that write files into the site, e.g. optimize_images.py and search_shards.py
+@event_priority(-100)
+def on_post_build(config):
+    start = time.perf_counter()
+    site_dir = Path(config.site_dir)
+    root_path = urlsplit(config.site_url or "/").path or "/"
+    if not root_path.endswith("/"):
+        root_path += "/"
+    files = sorted(path.relative_to(site_dir).as_posix() for path in site_dir.rglob("*") if path.is_file())
+
+    # Stylesheets last, they refer to the other files
+    assets = sorted((path for path in files if is_asset(path)), key=lambda path: path.endswith(".css"))
+    renamed = {}
+    for path in assets:
+        source = site_dir / path
+        if path.endswith(".css"):
+            css = source.read_text(encoding="utf-8")
+            source.write_text(rewrite_css(css, posixpath.dirname(path), renamed, root_path), encoding="utf-8")
+        stem, suffix = posixpath.splitext(path)
+        renamed[path] = f"{stem}.{digest(source)}{suffix}"
+        shutil.copyfile(source, site_dir / renamed[path])
+
+    for path in files:
+        if path.endswith(".html"):
+            page = site_dir / path
+            html = page.read_text(encoding="utf-8")
+            new_html = rewrite_html(html, posixpath.dirname(path), renamed, root_path)
+            if new_html != html:
+                page.write_text(new_html, encoding="utf-8")
+
+    immutable = sorted(
+        [*renamed.values(), *(path for path in files if hashed_name.search(path) and path.startswith("assets/"))]
+    )
+    immutable += [f"{folder}*" for folder in immutable_folders if (site_dir / folder).is_dir()]
+    (site_dir / "_headers").write_text(headers_file(immutable, root_path))
+    log.info(f"Fingerprinted {len(renamed)} files in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,63 @@
+"""
+Incremental copies of the folders imported from other repositories, see gen_python_ref_pages.py.
+"""
+
+from pathlib import Path
+import hashlib
+import shutil
+
+
+# Clean a folder completely
+def clean_folder(folder: Path):
+    if folder.exists() and folder.is_dir():
+        shutil.rmtree(folder)
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+# Cheap size/mtime check first, only hash the contents when those disagree
+def files_differ(src: Path, dest: Path) -> bool:
+    src_stat, dest_stat = src.stat(), dest.stat()
+    if src_stat.st_size != dest_stat.st_size:
+        return True
+    if src_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return False
+    return file_digest(src) != file_digest(dest)
+
+def list_files(folder: Path) -> set[Path]:
+    if not folder.is_dir():
+        return set()
+    return {path.relative_to(folder) for path in folder.rglob("*") if path.is_file()}
+
+# Make dest mirror src, only touching the files that were added, changed or removed.
+# Files listed in keep are generated into dest by gen_python_ref_pages.py, they are neither copied nor removed.
+def sync_folder(src: Path, dest: Path, keep: frozenset[str] = frozenset()) -> tuple[int, int, int]:
+    if not src.exists():
+        removed = len(list_files(dest))
+        clean_folder(dest)
+        return 0, 0, removed
+
+    src_files = {path for path in list_files(src) if path.as_posix() not in keep}
+    dest_files = {path for path in list_files(dest) if path.as_posix() not in keep}
+
+    for rel_path in dest_files - src_files:
+        (dest / rel_path).unlink()
+
+    copied = updated = 0
+    for rel_path in sorted(src_files):
+        target = dest / rel_path
+        if rel_path not in dest_files:
+            copied += 1
+        elif files_differ(src / rel_path, target):
+            updated += 1
+        else:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src / rel_path, target)
+
+    # Drop directories that became empty
+    for folder in sorted(dest.rglob("*"), reverse=True):
+        if folder.is_dir() and not any(folder.iterdir()):
+            folder.rmdir()
+
+    return copied, updated, len(dest_files - src_files)
@@ -0,0 +1,68 @@
+"""
+Adjust pages that frame external documentation (the `.framed-*` elements) when they are built.
+
+Registered as a mkdocs hook (see `hooks` in `mkdocs.yml`). This used to happen in docs/js/extra.js, which loaded
+jQuery from code.jquery.com on every page view to restyle these pages after they were shown. The hook makes the same
+changes to the HTML of every page:
+
+- a page with one `.framed-content` element gets the `framed-page` class on its body, which removes the margins of
+  the content and hides its headings (see docs/css/extra.css), and its edit and view buttons open in a new tab,
+- the edit and view buttons of pages that frame the openml-python or openml-r docs point to their source,
+- the edit and view buttons of pages that frame an API reference are removed.
+"""
+
+import re
+
+# Marker class: where the edit and view buttons (the links directly in `<article>`) point to
+edit_urls = {
+    "framed-python-guide": "https://github.com/openml/openml-python/edit/master/doc/usage.rst",
+    "framed-python-api": "https://github.com/openml/openml-python/edit/master/doc/api.rst",
+    "framed-python-start": "https://github.com/openml/openml-python/edit/master/doc/index.rst",
+    "framed-r": "https://github.com/openml/openml-r/edit/master/vignettes/OpenML.Rmd",
+}
+# Marker classes of pages without edit and view buttons
+no_edit_buttons = {"framed-r-api", "framed-java-api"}
+
+class_attribute = re.compile(r"""\bclass\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.IGNORECASE)
+body_tag = re.compile(r"<body\b[^>]*>", re.IGNORECASE)
+# The edit and view buttons of Material (partials/actions.html)
+content_button = re.compile(r"""<a\b[^>]*\bclass="md-content__button md-icon"[^>]*>.*?</a>""", re.DOTALL)
+href_attribute = re.compile(r"""\bhref="[^"]*\"""")
+
+
+def class_counts(html: str) -> dict[str, int]:
+    counts = {}
+    for match in class_attribute.finditer(html):
+        for name in (match.group(1) or match.group(2) or "").split():
+            if name.startswith("framed-"):
+                counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def add_body_class(html: str, name: str) -> str:
+    def add(match):
+        tag = match.group(0)
+        if class_attribute.search(tag):
+            return class_attribute.sub(lambda m: f'class="{(m.group(1) or m.group(2) or "")} {name}"', tag, count=1)
+        return f'{tag[:-1]} class="{name}">'
+
+    return body_tag.sub(add, html, count=1)
+
+
+def transform(html: str) -> str:
+    counts = class_counts(html)
+    if not counts:
+        return html
+    if counts.get("framed-content") == 1:
+        html = add_body_class(html, "framed-page")
+        html = content_button.sub(lambda m: m.group(0).replace("<a ", '<a target="_blank" ', 1), html)
+    for name, url in edit_urls.items():
+        if counts.get(name) == 1:
+            html = content_button.sub(lambda m: href_attribute.sub(f'href="{url}"', m.group(0), count=1), html)
+    if any(counts.get(name) == 1 for name in no_edit_buttons):
+        html = content_button.sub("", html)
+    return html
+
+
+def on_post_page(output, page, config):
+    return transform(output)
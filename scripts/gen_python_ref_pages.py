@@ -7,15 +7,21 @@ but modified for lack of "src/" file structure.
 """
 
 from pathlib import Path
-import shutil
-import mkdocs_gen_files
+import logging
 import os
 import shutil
+import sys
+import mkdocs_gen_files
 
-# Clean a folder completely
-def clean_folder(folder: Path):
-    if folder.exists() and folder.is_dir():
-        shutil.rmtree(folder)
+sys.path.insert(0, str(Path(__file__).parent))
+import prerender_reference
+import reference_cache
+import folder_sync
+
+log = logging.getLogger("mkdocs.plugins.gen_python_ref_pages")
+
+# Set OPENML_DOCS_CLEAN=1 to wipe and re-copy the imported folders instead of syncing them
+clean_build = os.environ.get("OPENML_DOCS_CLEAN", "0") == "1"
 
 root = Path(__file__).parent.parent
 temp_dir = root / "temp_dir" / "python"
@@ -27,9 +33,11 @@ destination_folders = [
     root / "openml",
 ]
 
-# Clean all destination folders
-for folder in destination_folders:
-    clean_folder(folder)
+# Files generated into the destination folders, kept between incremental syncs
+generated_files = {
+    root / "docs" / "python": frozenset({"index.md"}),
+    root / "docs" / "examples": frozenset({"SUMMARY.md"}),
+}
 
 # Source folders
 source_folders = [
@@ -44,8 +52,16 @@ def copy_folders(source_folders: list[Path], destination_folders: list[Path]):
         raise ValueError("Source and destination lists must have the same length.")
 
     for src, dest in zip(source_folders, destination_folders):
-        if src.exists():
-            shutil.copytree(src, dest)
+        if clean_build:
+            folder_sync.clean_folder(dest)
+            if src.exists():
+                shutil.copytree(src, dest)
+            continue
+        keep = generated_files.get(dest, frozenset())
+        copied, updated, removed = folder_sync.sync_folder(src, dest, keep)
+        log.info(
+            f"Synced {dest.relative_to(root)}: {copied} added, {updated} updated, {removed} removed"
+        )
 
 copy_folders(source_folders, destination_folders)
 
@@ -55,32 +71,75 @@ root = Path(__file__).parent.parent
 src = root / "openml"
 edit_path_root = "/openml/openml-python/blob/docs/mkdoc/"
 
-for path in sorted(src.rglob("*.py")):
-    module_path = path.relative_to(root).with_suffix("")
-    doc_path = path.relative_to(src).with_suffix(".md")
-    full_doc_path = Path("reference", doc_path)
-
-    parts = tuple(module_path.parts)
-
-    if parts[-1] == "__init__":
-        parts = parts[:-1]
-        doc_path = doc_path.with_name("index.md")
-        full_doc_path = full_doc_path.with_name("index.md")
-    elif parts[-1] == "__main__":
-        continue
+# Modules whose source did not change are served from the rendered page cache, see reference_cache.py
+options_hash = reference_cache.handler_options_hash(mkdocs_gen_files.config)
+previous_manifest = {} if clean_build else reference_cache.load_manifest()
+manifest = {}
+
+for path, identifier, full_doc_path in reference_cache.module_pages(src):
+    source_path = path.relative_to(root).as_posix()
+    source_stat = path.stat()
+    previous = previous_manifest.get(identifier)
+    if previous is not None and previous["source_path"] == source_path and previous["size"] == source_stat.st_size and previous["mtime_ns"] == source_stat.st_mtime_ns:
+        source_hash = previous["source_hash"]
+    else:
+        source_hash = reference_cache.file_digest(path)
+
+    manifest[identifier] = {
+        "source_path": source_path,
+        "size": source_stat.st_size,
+        "mtime_ns": source_stat.st_mtime_ns,
+        "source_hash": source_hash,
+        "cache_key": reference_cache.cache_key(identifier, source_hash, options_hash),
+        "doc_path": full_doc_path.as_posix(),
+    }
+
+if clean_build:
+    reference_cache.prune_fragments(set())
+
+# Render the pages that are not cached yet in parallel, the remaining misses are rendered by mkdocs itself
+missing = [
+    (entry["cache_key"], identifier, entry["doc_path"])
+    for identifier, entry in manifest.items()
+    if not reference_cache.has_fragment(entry["cache_key"])
+]
+if missing and reference_cache.url_map(mkdocs_gen_files.config.plugins["autorefs"]) is not None:
+    prerender_reference.prerender(mkdocs_gen_files.config.config_file_path, missing)
 
+changed_pages = cached_pages = 0
+for path, identifier, full_doc_path in reference_cache.module_pages(src):
+    doc_path = full_doc_path.relative_to("reference")
+    parts = tuple(identifier.split("."))
     if len(parts) > 1 and not parts[1].startswith("_"):
         nav[parts[1:]] = doc_path.as_posix()
 
+    entry = manifest[identifier]
+    key = entry["cache_key"]
+    if reference_cache.has_fragment(key):
+        page = f"<!-- reference-cache: load {key} -->\n"
+        cached_pages += 1
+    else:
+        page = f"::: {identifier}\n\n<!-- reference-cache: store {key} -->\n"
+    entry["page_hash"] = reference_cache.text_digest(page)
+    previous = previous_manifest.get(identifier)
+    if previous is None or previous.get("page_hash") != entry["page_hash"]:
+        changed_pages += 1
+
     with mkdocs_gen_files.open(full_doc_path, "w") as fd:
-        identifier = ".".join(parts)
-        print("::: " + identifier, file=fd)
+        fd.write(page)
 
     mkdocs_gen_files.set_edit_path(full_doc_path, Path(edit_path_root) / path.relative_to(root))
 
 with mkdocs_gen_files.open("reference/SUMMARY.md", "w") as nav_file:
     nav_file.writelines(nav.build_literate_nav())
 
+reference_cache.save_manifest(manifest)
+reference_cache.prune_fragments({entry["cache_key"] for entry in manifest.values()})
+log.info(
+    f"Reference pages: {changed_pages} of {len(manifest)} changed, {cached_pages} served from cache, "
+    f"{len(manifest) - cached_pages} rendered by mkdocs"
+)
+
 # Generate the example page index
 nav = mkdocs_gen_files.Nav()
 examples_src = root / "docs" / "examples"
@@ -94,13 +153,19 @@ for path in sorted(examples_src.rglob("*.py")):
 
     if len(parts) > 1:
         nav[parts] = dest_path.as_posix()
-with open(examples_src / "SUMMARY.md", "w") as nav_file:
-    nav_file.writelines(nav.build_literate_nav())
 
-# Add icon to the reference pages
+# Only rewrite the index when it changed, so mkdocs does not see it as modified
+summary = "".join(nav.build_literate_nav())
+summary_file = examples_src / "SUMMARY.md"
+if not summary_file.exists() or summary_file.read_text() != summary:
+    summary_file.write_text(summary)
+
+# Add icon to the reference pages. The index is kept with its header in docs/python, for builds without gen-files,
+# and only rewritten when its source changed, so mkdocs does not see it as modified
 content_to_add = "---\nicon: material/bookshelf\n---\n\n"
+index_source = temp_dir / "docs" / "index.md"
 index_file = root / "docs" / "python" / "index.md"
-with open(index_file, "r+") as file:
-    original_content = file.read()
-    file.seek(0)
-    file.write(content_to_add + original_content)
+if index_source.exists():
+    index_content = content_to_add + index_source.read_text()
+    if not index_file.exists() or index_file.read_text() != index_content:
+        index_file.write_text(index_content)
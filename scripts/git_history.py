@@ -0,0 +1,222 @@
+"""
+Index of the git history of every file, for the git-revision-date-localized and git-committers plugins.
+
+Registered as a mkdocs hook (see `hooks` in `mkdocs.yml`). Both plugins look up the history of every page on their
+own: git-revision-date-localized runs `git log` twice per page, git-committers walks the history of the page and
+then asks the GitHub API for its contributors. This hook reads the history once, with a single
+`git log --name-status` pass, into an index with the creation date, last update and authors of every file, and
+answers the questions of both plugins from that index.
+
+The index is stored in .cache/git_history.json, with the commit it was built up to, and later builds only read the
+commits that were added since. GitHub accounts are looked up once per author (from the commit e-mail address, or
+with one GitHub API call for one of their commits) instead of once per page. Set OPENML_DOCS_CLEAN=1 to rebuild it.
+"""
+
+from pathlib import Path
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent))
+import cache_utils
+
+log = logging.getLogger("mkdocs.plugins.git_history")
+
+root = Path(__file__).parent.parent
+index_file = root / ".cache" / "git_history.json"
+index_version = 1
+
+clean_build = os.environ.get("OPENML_DOCS_CLEAN", "0") == "1"
+
+noreply_email = re.compile(r"^(?:(\d+)\+)?([^@]+)@users\.noreply\.github\.com$")
+# Separates the commits in the git log output, followed by the hash, author date, name and e-mail
+commit_marker = "\x1e"
+
+# Set per build by on_config
+index: dict | None = None
+# Authors whose GitHub account could not be looked up during this build, they are not tried again until the next
+failed_lookups: set[str] = set()
+
+
+def git(*args: str) -> str:
+    return subprocess.run(
+        ["git", "-c", "core.quotepath=off", *args], cwd=root, capture_output=True, text=True, check=True
+    ).stdout
+
+
+def empty_index() -> dict:
+    return {"version": index_version, "head": None, "files": {}, "authors": {}, "users": {}}
+
+
+def load_index() -> dict:
+    if clean_build or not index_file.exists():
+        return empty_index()
+    index = json.loads(index_file.read_text())
+    return index if index.get("version") == index_version else empty_index()
+
+
+def save_index(index: dict):
+    cache_utils.atomic_write(index_file, json.dumps(index))
+
+
+def add_commits(index: dict, log_output: str):
+    """
+    Add the output of `git log --reverse --name-status -M` (oldest commit first) to the index.
+    """
+    files = index["files"]
+    for block in log_output.split(commit_marker)[1:]:
+        header, *changes = block.strip("\n").split("\n")
+        commit, timestamp, name, email = header.split("\t")
+        timestamp = int(timestamp)
+        index["authors"][email] = {"name": name, "commit": commit}
+        for change in changes:
+            if not change:
+                continue
+            status, *paths = change.split("\t")
+            if status.startswith("R"):
+                # A renamed file keeps its history, like `git log --follow`
+                old, path = paths
+                entry = files.pop(old, None) or {"created": timestamp, "updated": timestamp, "authors": []}
+            else:
+                path = paths[-1]
+                entry = files.get(path) or {"created": timestamp, "updated": timestamp, "authors": []}
+                if status != "D":
+                    # Renames do not count as updates, like `git log --diff-filter=r`
+                    entry["updated"] = timestamp
+            entry["last"] = timestamp
+            # Most recent author first
+            entry["authors"] = [email, *[author for author in entry["authors"] if author != email]]
+            files[path] = entry
+
+
+def update_index(index: dict) -> tuple[dict, int]:
+    """
+    Add the commits since the last indexed commit to the index, and return it with the number of new commits.
+    """
+    head = git("rev-parse", "HEAD").strip()
+    if index["head"] == head:
+        return index, 0
+    if index["head"] is not None:
+        # History was rewritten, or the indexed commit is not part of this checkout
+        is_ancestor = subprocess.run(
+            ["git", "merge-base", "--is-ancestor", index["head"], head], cwd=root, capture_output=True
+        ).returncode == 0
+        if not is_ancestor:
+            index = {**empty_index(), "users": index["users"]}
+    revisions = f"{index['head']}..{head}" if index["head"] else head
+    output = git("log", "--reverse", "--name-status", "-M", f"--format={commit_marker}%H%x09%at%x09%an%x09%ae", revisions)
+    add_commits(index, output)
+    index["head"] = head
+    return index, output.count(commit_marker)
+
+
+def github_user(index: dict, email: str, repository: str, headers: dict | None) -> dict | None:
+    """
+    The GitHub account of an author, as the git-committers plugin describes it, or None when it is not known.
+    """
+    users = index["users"]
+    if email in users:
+        return users[email]
+    if email in failed_lookups:
+        return None
+    author = index["authors"][email]
+    match = noreply_email.match(email)
+    if match:
+        user_id, login = match.groups()
+        avatar = f"https://avatars.githubusercontent.com/u/{user_id}?v=4" if user_id else f"https://github.com/{login}.png"
+        users[email] = {"login": login, "name": login, "url": f"https://github.com/{login}", "avatar": avatar}
+        return users[email]
+    try:
+        response = requests.get(
+            f"https://api.github.com/repos/{repository}/commits/{author['commit']}", headers=headers, timeout=10
+        )
+    except requests.RequestException as e:
+        log.info(f"Could not look up the GitHub account of {author['name']}: {e}")
+        failed_lookups.add(email)
+        return None
+    if response.status_code != 200:
+        # Not stored, so it is looked up again in the next build
+        log.info(f"Could not look up the GitHub account of {author['name']}: {response.status_code}")
+        failed_lookups.add(email)
+        return None
+    account = response.json().get("author")
+    users[email] = account and {
+        "login": account["login"],
+        "name": account["login"],
+        "url": account["html_url"],
+        "avatar": account["avatar_url"] or "",
+    }
+    return users[email]
+
+
+def revision_timestamp(util, index: dict):
+    original = util.get_git_commit_timestamp
+
+    def get_git_commit_timestamp(path: str, is_first_commit: bool = False) -> int:
+        realpath = Path(os.path.realpath(path))
+        if not realpath.is_file() or not realpath.is_relative_to(root):
+            return original(path, is_first_commit)
+        entry = index["files"].get(realpath.relative_to(root).as_posix())
+        if entry is None:
+            # Not committed yet, same as the plugin does
+            return int(time.time())
+        return entry["created"] if is_first_commit else entry["updated"]
+
+    return get_git_commit_timestamp
+
+
+def committers(plugin, index: dict):
+    original = plugin.list_contributors
+
+    def list_contributors(path: str):
+        path = path.replace("\\", "/")
+        entry = index["files"].get(path)
+        if entry is None or plugin.config["gitlab_repository"]:
+            return original(path)
+        last_commit_date = time.strftime("%Y-%m-%d", time.gmtime(entry["last"]))
+        authors = []
+        for email in entry["authors"]:
+            user = github_user(index, email, plugin.config["repository"], plugin.auth_header)
+            if user and user["login"] not in plugin.exclude_committers and user not in authors:
+                authors.append(user)
+        return authors, last_commit_date
+
+    return list_contributors
+
+
+def on_config(config):
+    global index
+    revision_plugin = config.plugins.get("git-revision-date-localized")
+    committers_plugin = config.plugins.get("git-committers")
+    revision_enabled = revision_plugin is not None and revision_plugin.config["enabled"]
+    committers_enabled = committers_plugin is not None and committers_plugin.enabled
+    if not (revision_enabled or committers_enabled):
+        return
+    failed_lookups.clear()
+    start = time.perf_counter()
+    try:
+        index, new_commits = update_index(load_index())
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        log.warning(f"Could not read the git history, the git plugins look it up per page instead: {e}")
+        return
+    save_index(index)
+    log.info(
+        f"Indexed {new_commits} new commits, history of {len(index['files'])} files "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    if revision_enabled:
+        revision_plugin.util.get_git_commit_timestamp = revision_timestamp(revision_plugin.util, index)
+    if committers_enabled:
+        committers_plugin.list_contributors = committers(committers_plugin, index)
+
+
+def on_post_build(config):
+    # Store the GitHub accounts that were looked up during the build
+    if index is not None:
+        save_index(index)
@@ -6,58 +6,543 @@ Does not rely on the GitHub API, so it is limited to the information that can be
 Inspired in part from https://brightdata.com/blog/how-tos/how-to-scrape-github-repositories-in-python
 """
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urlsplit
+from typing import Iterator
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
-with open("showcase_urls.txt", "r") as file:
-    target_urls = file.readlines()
-    target_urls = [url.strip() for url in target_urls]
+import cache_utils
+
+scripts_dir = Path(__file__).parent
+cache_dir = scripts_dir.parent / ".cache" / "showcase"
+store_file = scripts_dir.parent / ".cache" / "showcase_repositories.jsonl"
+
+
+class HostRateLimiter:
+    """
+    Spaces out the requests to each host by at least `interval` seconds, shared by all worker threads.
+    """
+
+    def __init__(self, interval:float):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_slot: dict[str, float] = {}
+
+    def wait(self, url:str):
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        time.sleep(slot - now)
+
+
+def make_session(workers:int)->requests.Session:
+    """
+    Create a session whose connection pool is large enough to keep one connection open per worker.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class ResponseCache:
+    """
+    On-disk cache of the fetched pages, keyed by URL.
+
+    Entries younger than `ttl` seconds are used without any request. Older entries are revalidated with
+    If-None-Match / If-Modified-Since, so an unchanged page costs a single 304 response. The repository
+    info parsed from the page is cached too, so a revalidated page is not parsed again.
+    """
+
+    def __init__(self, directory:Path, ttl:float):
+        self.directory = directory
+        self.ttl = ttl
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, url:str)->Path:
+        return self.directory / (hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def _write(self, url:str, entry:dict):
+        cache_utils.atomic_write(self._path(url), json.dumps(entry))
+
+    def get(self, url:str)->dict|None:
+        path = self._path(url)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
 
-def get_github_info(target_url:str)->tuple[str, str, str]:
+    def is_fresh(self, entry:dict)->bool:
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    def conditional_headers(self, entry:dict)->dict[str, str]:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url:str, response:requests.Response, info:tuple[str, str, str]):
+        self._write(url, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "info": info,
+            "body": response.text,
+        })
+
+    def revalidated(self, url:str, entry:dict):
+        entry["fetched_at"] = time.time()
+        self._write(url, entry)
+
+
+class RepositoryStore:
+    """
+    The scraped name, description, stars and fetch time of every showcased repository, kept between runs
+    as JSON Lines, one record per URL.
+    """
+
+    def __init__(self, path:Path):
+        self.path = path
+        self.records: dict[str, dict] = {}
+        if path.exists():
+            with open(path, "r") as file:
+                for line in file:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.records[record["url"]] = record
+
+    def stale_urls(self, target_urls:set[str], max_age:float)->set[str]:
+        """
+        The URLs that are not in the store yet, or were fetched more than `max_age` seconds ago.
+        """
+        now = time.time()
+        return {
+            url for url in target_urls
+            if url not in self.records or now - self.records[url]["fetched_at"] >= max_age
+        }
+
+    def update(self, url:str, info:tuple[str, str, str]):
+        name, description, stars = info
+        self.records[url] = {"url": url, "name": name, "description": description, "stars": stars, "fetched_at": time.time()}
+
+    def prune(self, target_urls:set[str])->int:
+        """
+        Remove the repositories that are no longer showcased, and return how many were removed.
+        """
+        removed = [url for url in self.records if url not in target_urls]
+        for url in removed:
+            del self.records[url]
+        return len(removed)
+
+    def save(self):
+        lines = [json.dumps(self.records[url]) + "\n" for url in sorted(self.records)]
+        cache_utils.atomic_write(self.path, "".join(lines))
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request to a host whose circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a host for `cooldown` seconds after `threshold` consecutive failed requests
+    (429 and 5xx responses, timeouts and connection errors). After the cooldown the breaker is half-open: the
+    first request is let through as a probe and the others are rejected until record() reports its result. The
+    breaker closes when the probe succeeds, and opens again right away when it fails.
+    """
+
+    def __init__(self, threshold:int=5, cooldown:float=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures: dict[str, int] = {}
+        self.open_until: dict[str, float] = {}
+        # Hosts whose breaker is half-open, with the thread that sends the probe request
+        self.probing: dict[str, int] = {}
+
+    def check(self, url:str):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.open_until:
+                return
+            if host in self.probing or time.monotonic() < self.open_until[host]:
+                raise CircuitOpenError(f"Too many failed requests to {host}, not sending more for now")
+            self.probing[host] = threading.get_ident()
+
+    def record(self, url:str, success:bool):
+        host = urlsplit(url).netloc
+        with self.lock:
+            # Requests that were already sent when the breaker opened do not end the probe
+            probe = self.probing.get(host) == threading.get_ident()
+            if probe:
+                del self.probing[host]
+            if success:
+                self.failures[host] = 0
+                self.open_until.pop(host, None)
+                return
+            self.failures[host] = self.failures.get(host, 0) + 1
+            if probe or self.failures[host] >= self.threshold:
+                self.open_until[host] = time.monotonic() + self.cooldown
+
+
+class RetryPolicy:
+    """
+    Sends GET requests with a timeout, and retries 429 and 5xx responses, timeouts and connection errors
+    up to `retries` times with exponential backoff, honouring Retry-After.
+    """
+
+    retry_statuses = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        retries:int=3,
+        backoff:float=1.0,
+        timeout:float=30,
+        breaker:CircuitBreaker|None=None,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+    def delay(self, attempt:int, response:requests.Response|None)->float:
+        # Jitter, so the worker threads do not all retry at the same moment
+        delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    def get(
+        self,
+        session:requests.Session,
+        url:str,
+        headers:dict[str, str],
+        rate_limiter:HostRateLimiter|None=None,
+    )->requests.Response:
+        for attempt in range(self.retries + 1):
+            self.breaker.check(url)
+            if rate_limiter is not None:
+                rate_limiter.wait(url)
+            response = None
+            try:
+                response = session.get(url, headers=headers, timeout=self.timeout)
+                response.raise_for_status()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except requests.HTTPError as e:
+                if response.status_code not in self.retry_statuses:
+                    self.breaker.record(url, True)
+                    raise
+                error = e
+            except requests.RequestException:
+                # Not a failure of the host (e.g. too many redirects), but it ends a probe all the same
+                self.breaker.record(url, True)
+                raise
+            else:
+                self.breaker.record(url, True)
+                return response
+            self.breaker.record(url, False)
+            if attempt < self.retries:
+                time.sleep(self.delay(attempt, response))
+        raise error
+
+
+def get_github_info(
+    target_url:str,
+    session:requests.Session|None=None,
+    cache:ResponseCache|None=None,
+    rate_limiter:HostRateLimiter|None=None,
+    retry:RetryPolicy|None=None,
+)->tuple[str, str, str]:
     """
     Get the name, description and number of stars of a GitHub repository from its URL.
     """
-    print(target_url)
-    page = requests.get(target_url)
-    soup = BeautifulSoup(page.text, "html.parser")
-    name_html_element = soup.select_one('[itemprop="name"]')
-    name = name_html_element.text.strip()
+    entry = cache.get(target_url) if cache is not None else None
+    if entry is not None and cache.is_fresh(entry):
+        return tuple(entry["info"])
+
+    headers = cache.conditional_headers(entry) if entry is not None else {}
+    retry = retry or RetryPolicy()
+    page = retry.get(session or requests.Session(), target_url, headers, rate_limiter)
+    if entry is not None and page.status_code == 304:
+        cache.revalidated(target_url, entry)
+        return tuple(entry["info"])
 
-    bordergrid_html_element = soup.select_one(".BorderGrid")
-    about_html_element = bordergrid_html_element.select_one("h2")
-    description_html_element = about_html_element.find_next_sibling("p")
-    description = description_html_element.get_text().strip()
+    info = parse_github_page(page.text)
+    if cache is not None:
+        cache.store(target_url, page, info)
+    return info
 
-    star_icon_html_element = bordergrid_html_element.select_one(".octicon-star")
-    stars_html_element = star_icon_html_element.find_next_sibling("strong")
-    stars = stars_html_element.get_text().strip().replace(",", "")
+
+# Elements that never have an end tag, so they do not open a new level in RepositoryInfoParser
+void_elements = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Depth no element is at, for siblings that can no longer be found
+no_depth = -1
+
+
+class RepositoryInfoParser(HTMLParser):
+    """
+    Streaming parser that only extracts what parse_github_page_soup() reads: the text of the `itemprop="name"`
+    element, and within the first `.BorderGrid` the paragraph following its first `h2` and the `strong` element
+    following the `.octicon-star` icon, both siblings under the same parent. It only tracks the nesting depth
+    instead of building a tree, and `done` is set as soon as all three are found, so the rest of the page does not
+    need to be parsed.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.depth = 0
+        self.fields: dict[str, str] = {}
+        # Field currently being captured, and the depth at which its element closes
+        self.capturing: str | None = None
+        self.capture_depth = 0
+        self.in_bordergrid = False
+        self.bordergrid_seen = False
+        self.bordergrid_depth = 0
+        self.h2_depth: int | None = None
+        self.description_depth: int | None = None
+        self.star_depth: int | None = None
+        self.stars_depth: int | None = None
+
+    @property
+    def done(self)->bool:
+        return len(self.fields) == 3 and self.capturing is None
+
+    def start_capture(self, field:str):
+        self.capturing = field
+        self.capture_depth = self.depth
+        self.fields[field] = ""
+
+    def handle_starttag(self, tag:str, attrs:list[tuple[str, str | None]]):
+        if tag in void_elements:
+            return
+        self.depth += 1
+        attributes = dict(attrs)
+        classes = (attributes.get("class") or "").split()
+
+        if self.capturing is not None:
+            return
+        if "name" not in self.fields and attributes.get("itemprop") == "name":
+            self.start_capture("name")
+        elif not self.bordergrid_seen and "BorderGrid" in classes:
+            self.in_bordergrid = self.bordergrid_seen = True
+            self.bordergrid_depth = self.depth
+        elif self.in_bordergrid:
+            if tag == "h2" and self.h2_depth is None:
+                self.h2_depth = self.depth
+            elif tag == "p" and self.depth == self.description_depth and "description" not in self.fields:
+                self.start_capture("description")
+            elif "octicon-star" in classes and self.star_depth is None:
+                self.star_depth = self.depth
+            elif tag == "strong" and self.depth == self.stars_depth and "stars" not in self.fields:
+                self.start_capture("stars")
+
+    def handle_startendtag(self, tag:str, attrs:list[tuple[str, str | None]]):
+        # Self-closing tags, such as the svg icons, open and close a level at once
+        if tag in void_elements:
+            return
+        self.handle_starttag(tag, attrs)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag:str):
+        if tag in void_elements:
+            return
+        if self.capturing is not None and self.depth == self.capture_depth:
+            self.capturing = None
+        if self.in_bordergrid:
+            if self.depth == self.h2_depth and self.description_depth is None:
+                self.description_depth = self.depth
+            elif self.h2_depth is not None and self.depth == self.h2_depth - 1:
+                # The parent of the h2 closes: no sibling paragraph, so the description is not found
+                self.h2_depth = self.description_depth = no_depth
+            if self.depth == self.star_depth and self.stars_depth is None:
+                self.stars_depth = self.depth
+            elif self.star_depth is not None and self.depth == self.star_depth - 1:
+                self.star_depth = self.stars_depth = no_depth
+            if self.depth == self.bordergrid_depth:
+                self.in_bordergrid = False
+        self.depth -= 1
+
+    def handle_data(self, data:str):
+        if self.capturing is not None:
+            self.fields[self.capturing] += data
+
+
+star_suffixes = {"k": 1_000, "m": 1_000_000}
+
+
+def star_count(stars:str)->int:
+    """
+    The number of stars as GitHub displays it ("1,234", "1.2k", "3m"), or 0 when it is not a number.
+    """
+    text = stars.strip().replace(",", "").lower()
+    multiplier = star_suffixes.get(text[-1:], 1)
+    if multiplier > 1:
+        text = text[:-1]
+    try:
+        return round(float(text) * multiplier)
+    except ValueError:
+        return 0
+
+
+def parse_github_page_fast(html:str, chunk_size:int=64 * 1024)->tuple[str, str, str]|None:
+    """
+    Extract the repository info with RepositoryInfoParser, feeding the page in chunks and stopping as soon
+    as everything was found. Returns None when the page does not have the expected structure.
+    """
+    parser = RepositoryInfoParser()
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start:start + chunk_size])
+        if parser.done:
+            break
+    if not parser.done:
+        return None
+    fields = parser.fields
+    return fields["name"].strip(), fields["description"].strip(), str(star_count(fields["stars"]))
+
+
+def parse_github_page(html:str)->tuple[str, str, str]:
+    """
+    Get the name, description and number of stars of a GitHub repository from the HTML of its page.
+    Uses the streaming parser, and falls back to the full BeautifulSoup parse if that fails.
+    """
+    info = parse_github_page_fast(html)
+    if info is None:
+        info = parse_github_page_soup(html)
+    return info
+
+
+def parse_github_page_soup(html:str)->tuple[str, str, str]:
+    """
+    Get the name, description and number of stars of a GitHub repository by parsing its full page with BeautifulSoup.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    try:
+        name_html_element = soup.select_one('[itemprop="name"]')
+        name = name_html_element.text.strip()
+
+        bordergrid_html_element = soup.select_one(".BorderGrid")
+        about_html_element = bordergrid_html_element.select_one("h2")
+        description_html_element = about_html_element.find_next_sibling("p")
+        description = description_html_element.get_text().strip()
+
+        star_icon_html_element = bordergrid_html_element.select_one(".octicon-star")
+        stars_html_element = star_icon_html_element.find_next_sibling("strong")
+        stars = str(star_count(stars_html_element.get_text()))
+    except AttributeError:
+        # select_one and find_next_sibling return None when the page does not look like a repository page
+        raise ValueError("Could not find the repository name, description and stars on the page") from None
 
     return name, description, stars
 
 
-def return_details(target_urls:list[str])->dict[str, dict[str, str]]:
+class ScrapeResult:
+    """
+    The repositories that could be scraped, or were taken from the store or cache because fetching them
+    failed, sorted by stars, and the error of every URL that failed.
+    """
+
+    def __init__(self, repositories:dict[str, dict[str, str]], failures:dict[str, str]):
+        self.repositories = repositories
+        self.failures = failures
+
+
+def return_details(
+    target_urls:list[str],
+    workers:int=8,
+    interval:float=0.25,
+    cache:ResponseCache|None=None,
+    store:RepositoryStore|None=None,
+    max_age:float=0,
+    retry:RetryPolicy|None=None,
+)->ScrapeResult:
     """
-    For a list of GitHub URLs, return a dictionary with the name, description and number of stars of the repositories.
+    For a list of GitHub URLs, return the name, description and number of stars of the repositories.
+
+    The pages are fetched by `workers` threads sharing one connection pool, with at least `interval` seconds
+    between two requests to the same host. Pages in `cache` are revalidated instead of downloaded again.
+    With a `store`, only repositories that are new or were fetched more than `max_age` seconds ago are
+    refreshed, the others are taken from the store. Repositories no longer in `target_urls` are pruned from it.
+
+    A URL that still fails after the retries of `retry` is reported in the failures of the result, and its
+    previous values from the store or cache are used, if there are any.
     """
     target_urls = set(target_urls)  # remove duplicates
+    if store is not None:
+        store.prune(target_urls)
+        fetch_urls = store.stale_urls(target_urls, max_age)
+    else:
+        fetch_urls = target_urls
+    session = make_session(workers)
+    rate_limiter = HostRateLimiter(interval)
+    retry = retry or RetryPolicy()
+
+    def fetch(target_url:str)->tuple[str, str, str]:
+        return get_github_info(target_url, session, cache, rate_limiter, retry)
+
+    details = {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch, target_url): target_url for target_url in fetch_urls}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            try:
+                details[futures[future]] = future.result()
+            except Exception as e:
+                failures[futures[future]] = f"{type(e).__name__}: {e}"
+
+    if store is not None:
+        for target_url, info in details.items():
+            store.update(target_url, info)
+        store.save()
+        details = {
+            url: (record["name"], record["description"], record["stars"])
+            for url, record in store.records.items()
+        }
+    elif cache is not None:
+        for target_url in failures:
+            entry = cache.get(target_url)
+            if entry is not None:
+                details[target_url] = tuple(entry["info"])
+
     urls = {}
-    for target_url in target_urls:
-        name, description, stars = get_github_info(target_url)
+    for target_url, (name, description, stars) in details.items():
         if len(name) > 0:
             urls[target_url] = {
                 "name": name,
                 "description": description,
                 "stars": stars,
             }
-    # sort by stars
+    # sort by stars, records stored by earlier versions can still hold "1.2k"
     urls = dict(
-        sorted(urls.items(), key=lambda item: int(item[1]["stars"]), reverse=True)
+        sorted(urls.items(), key=lambda item: star_count(item[1]["stars"]), reverse=True)
     )
-    return urls
+    return ScrapeResult(urls, failures)
 
 
-def return_div(url:str, urls:dict[str, dict[str, str]]):
+def return_div(url:str, info:dict[str, str]):
     """
         Return a div element with the information of a GitHub repository. Creates a card with the name, description and number of stars of the repository.
 
@@ -95,7 +580,6 @@ def return_div(url:str, urls:dict[str, dict[str, str]]):
         border: none;
     }
     """
-    info = urls[url]
     return f"""
     \n<div class="card">
     <h2><a href="{url}">{info['name']} <img class="github-logo" src="../img/logo-github.svg"> <small>{info['stars']} stars</small></a></h2>
@@ -104,22 +588,76 @@ def return_div(url:str, urls:dict[str, dict[str, str]]):
     """
 
 
-def generate_page(info:dict[str,str]):
+def iter_page(info:dict[str, dict[str, str]])->Iterator[str]:
+    """
+    Yield the fragments of a page with a grid of cards with the information of the repositories.
+    """
+    yield """<div class="card-container">\n"""
+    for target_url, repository in info.items():
+        yield return_div(target_url, repository)
+    yield "</div>"
+
+
+def generate_page(info:dict[str, dict[str, str]])->str:
     """
     Generate a page with a grid of cards with the information of the repositories.
     """
+    return "".join(iter_page(info))
 
-    page = """<div class="card-container">\n"""
-    for target_url in tqdm(info.keys(), total=len(info)):
-        page += return_div(target_url, info)
-    page += "</div>"
-    return page
+
+def write_page(info:dict[str, dict[str, str]], path:Path):
+    """
+    Stream the page into a temporary file next to `path` and move it into place once it is complete,
+    so an interrupted run never leaves a half-written page behind.
+    """
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=f".{path.name}.", delete=False) as file:
+        try:
+            file.writelines(iter_page(info))
+            file.flush()
+            os.fsync(file.fileno())
+            # Temporary files are only readable by their owner, keep the permissions of the page instead
+            os.chmod(file.name, path.stat().st_mode if path.exists() else 0o644)
+        except BaseException:
+            file.close()
+            os.unlink(file.name)
+            raise
+    os.replace(file.name, path)
 
 
-info = return_details(target_urls)
-# print(generate_page(info))
-with open("../docs/ecosystem/showcase.md", "w") as file:
-    file.write(generate_page(info))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate docs/ecosystem/showcase.md from showcase_urls.txt")
+    parser.add_argument("--workers", type=int, default=8, help="Number of pages fetched concurrently")
+    parser.add_argument("--interval", type=float, default=0.25, help="Minimum seconds between requests to one host")
+    parser.add_argument("--ttl", type=float, default=24 * 3600, help="Seconds before a repository is refreshed")
+    parser.add_argument("--no-cache", action="store_true", help="Always download every page")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per page after a 429, 5xx or network error")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds before a request times out")
+    args = parser.parse_args()
+
+    with open(scripts_dir / "showcase_urls.txt", "r") as file:
+        target_urls = file.readlines()
+        target_urls = [url.strip() for url in target_urls if url.strip()]
+
+    cache = store = None
+    if not args.no_cache:
+        cache = ResponseCache(cache_dir, args.ttl)
+        store = RepositoryStore(store_file)
+    retry = RetryPolicy(retries=args.retries, timeout=args.timeout)
+    result = return_details(
+        target_urls,
+        workers=args.workers,
+        interval=args.interval,
+        cache=cache,
+        store=store,
+        max_age=args.ttl,
+        retry=retry,
+    )
+    for url, error in sorted(result.failures.items()):
+        print(f"Failed to scrape {url}: {error}", file=sys.stderr)
+    if not result.repositories:
+        sys.exit("No repositories could be scraped, leaving the showcase page unchanged")
+    # print(generate_page(result.repositories))
+    write_page(result.repositories, scripts_dir.parent / "docs" / "ecosystem" / "showcase.md")
 
-# test = ["https://github.com/openml/openml-python"]
-# print(return_details(test))
+    # test = ["https://github.com/openml/openml-python"]
+    # print(return_details(test))
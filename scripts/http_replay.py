@@ -0,0 +1,272 @@
+"""
+Record/replay layer for the HTTP traffic of the examples, a local stand-in for the OpenML server.
+
+`install()` patches urllib3 inside the process that runs the example (for the examples, the Jupyter kernel; see the
+`--http` option of run_examples.py). That catches the requests made by openml-python through `requests` as well
+as the dataset downloads through minio. Each request is keyed by its method, URL and body, without the API key.
+
+- `live`: requests go to the real server, and are only counted.
+- `record`: requests go to the real server, and every response is stored in the fixture store.
+- `replay`: responses come from the fixture store only. A request that was never recorded raises FixtureNotFoundError.
+  By default they are served at disk speed. With a latency factor, every response waits for the time to first byte
+  and the transfer time that were recorded, multiplied by that factor.
+
+The fixture store is compressed: every example has an index of its recorded responses in `<example>.json.gz`, and
+the bodies are gzipped and stored once under their hash in `bodies/`, shared by all examples.
+
+The number of requests and API calls and the bytes sent and received (per host as well) are written to a stats file
+after every request, so the bandwidth an example uses is known even when it fails or is killed.
+"""
+
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import gzip
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.response import HTTPResponse
+
+import cache_utils
+
+# Query parameters that are left out of the request key and the recorded URL
+secret_parameters = {"api_key"}
+multipart_api_key = re.compile(rb'(name="api_key"\r\n\r\n)[^\r]*')
+# Headers that describe how the original response was sent, not what it contains
+transport_headers = {"transfer-encoding", "connection", "keep-alive", "content-length"}
+# Positional arguments of HTTPConnectionPool.urlopen after the body and headers, which urllib3 uses for retries
+urlopen_arguments = [
+    "retries", "redirect", "assert_same_host", "timeout", "pool_timeout", "release_conn", "chunked", "body_pos",
+    "preload_content", "decode_content",
+]
+
+
+class FixtureNotFoundError(RuntimeError):
+    """
+    Raised in replay mode for a request that was not recorded.
+    """
+
+
+def clean_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if name not in secret_parameters]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def body_bytes(body, headers) -> bytes | None:
+    """
+    The request body as bytes without the API key and with a fixed multipart boundary, or None for streamed bodies.
+    """
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        body = body.encode()
+    if not isinstance(body, bytes):
+        return None
+    content_type = next((value for name, value in (headers or {}).items() if name.lower() == "content-type"), "")
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return b"&".join(part for part in body.split(b"&") if not part.startswith(b"api_key="))
+    if "boundary=" in content_type:
+        boundary = content_type.split("boundary=", 1)[1].split(";")[0].strip('"')
+        body = body.replace(boundary.encode(), b"boundary")
+        return multipart_api_key.sub(rb"\1", body)
+    return body
+
+
+def request_key(method: str, url: str, body: bytes | None) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps([method.upper(), clean_url(url)]).encode())
+    digest.update(body if body is not None else b"<stream>")
+    return digest.hexdigest()
+
+
+def make_response(recording: dict, body: io.BytesIO, method: str, url: str, preload_content: bool, decode_content: bool) -> HTTPResponse:
+    headers = [(name, value) for name, value in recording["headers"] if name.lower() not in transport_headers]
+    headers.append(("Content-Length", str(len(body.getbuffer()))))
+    return HTTPResponse(
+        body=body,
+        headers=headers,
+        status=recording["status"],
+        reason=recording["reason"],
+        version=11,
+        version_string="HTTP/1.1",
+        preload_content=preload_content,
+        decode_content=decode_content,
+        request_method=method,
+        request_url=url,
+    )
+
+
+class ThrottledBody(io.BytesIO):
+    """
+    A response body that takes `duration` seconds to read in full.
+    """
+
+    def __init__(self, data: bytes, duration: float):
+        super().__init__(data)
+        self.seconds_per_byte = duration / max(len(data), 1)
+
+    def read(self, size: int | None = -1) -> bytes:
+        chunk = super().read(size)
+        time.sleep(len(chunk) * self.seconds_per_byte)
+        return chunk
+
+    def read1(self, size: int | None = -1) -> bytes:
+        return self.read(size)
+
+
+class FixtureStore:
+    """
+    The recorded responses of one example: an index in `<name>.json.gz`, and the compressed bodies in `bodies/`.
+    """
+
+    def __init__(self, directory: Path, name: str):
+        self.bodies_dir = directory / "bodies"
+        self.index_file = directory / f"{name}.json.gz"
+        self.index = json.loads(gzip.decompress(self.index_file.read_bytes())) if self.index_file.exists() else {}
+
+    def body_path(self, digest: str) -> Path:
+        return self.bodies_dir / digest[:2] / f"{digest}.gz"
+
+    def get(self, key: str) -> tuple[dict, bytes] | None:
+        recording = self.index.get(key)
+        if recording is None:
+            return None
+        return recording, gzip.decompress(self.body_path(recording["body"]).read_bytes())
+
+    def put(self, key: str, recording: dict, raw: bytes):
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self.body_path(digest)
+        if not path.exists():
+            cache_utils.atomic_write(path, gzip.compress(raw, mtime=0))
+        self.index[key] = {**recording, "body": digest, "size": len(raw)}
+        # Saved after every request, so an example that fails halfway keeps what it recorded
+        cache_utils.atomic_write(
+            self.index_file, gzip.compress(json.dumps(self.index, indent=1, sort_keys=True).encode(), mtime=0)
+        )
+
+
+class Recorder:
+    """
+    Records or replays the requests of a process, and counts them.
+    """
+
+    def __init__(self, store: FixtureStore | None, mode: str, stats_file: Path | None = None, latency: float = 0.0):
+        if mode not in ("live", "record", "replay"):
+            raise ValueError(f"Unknown mode {mode!r}, expected 'live', 'record' or 'replay'")
+        self.store = store
+        self.mode = mode
+        self.latency = latency
+        self.stats_file = Path(stats_file) if stats_file else None
+        self.stats = {
+            "mode": mode,
+            "requests": 0,
+            "api_calls": 0,
+            "bytes_downloaded": 0,
+            "bytes_uploaded": 0,
+            "missing": 0,
+            "hosts": {},
+        }
+
+    def count(self, url: str, sent: int, received: int):
+        stats = self.stats
+        stats["requests"] += 1
+        stats["api_calls"] += "/api/" in urlsplit(url).path
+        stats["bytes_uploaded"] += sent
+        stats["bytes_downloaded"] += received
+        host = stats["hosts"].setdefault(urlsplit(url).netloc, {"requests": 0, "bytes_downloaded": 0})
+        host["requests"] += 1
+        host["bytes_downloaded"] += received
+        self.save_stats()
+
+    def save_stats(self):
+        if self.stats_file is not None:
+            self.stats_file.write_text(json.dumps(self.stats))
+
+    def urlopen(self, original, pool: HTTPConnectionPool, method: str, url: str, body=None, headers=None, **kwargs):
+        if url.startswith("/"):
+            url = f"{pool.scheme}://{pool.host}:{pool.port}{url}"
+        sent = body_bytes(body, headers)
+        key = request_key(method, url, sent)
+        preload_content = kwargs.get("preload_content", True)
+        decode_content = kwargs.get("decode_content", True)
+
+        if self.mode == "replay":
+            fixture = self.store.get(key)
+            if fixture is None:
+                self.stats["missing"] += 1
+                self.save_stats()
+                raise FixtureNotFoundError(f"No recorded response for {method} {clean_url(url)}")
+            recording, raw = fixture
+            self.count(url, len(sent or b""), len(raw))
+            time.sleep(recording["ttfb_s"] * self.latency)
+            response_body = ThrottledBody(raw, recording["transfer_s"] * self.latency) if self.latency else io.BytesIO(raw)
+            return make_response(recording, response_body, method, url, preload_content, decode_content)
+
+        start = time.perf_counter()
+        response = original(pool, method, url, body=body, headers=headers, **{**kwargs, "preload_content": False})
+        ttfb = time.perf_counter() - start
+        # Raw bytes as sent by the server, so they are decoded again exactly like the original response
+        raw = response.read(decode_content=False)
+        response.release_conn()
+        recording = {
+            "method": method,
+            "url": clean_url(url),
+            "status": response.status,
+            "reason": response.reason,
+            "headers": list(response.headers.items()),
+            "ttfb_s": ttfb,
+            "transfer_s": time.perf_counter() - start - ttfb,
+        }
+        if self.mode == "record":
+            self.store.put(key, recording, raw)
+        self.count(url, len(sent or b""), len(raw))
+        return make_response(recording, io.BytesIO(raw), method, url, preload_content, decode_content)
+
+
+# The recorder of this process, set by install()
+recorder: Recorder | None = None
+
+
+def install(
+    fixtures_dir: str | Path | None,
+    name: str = "",
+    mode: str = "replay",
+    stats_file: str | Path | None = None,
+    latency: float = 0.0,
+) -> Recorder:
+    """
+    Record, replay or only count all HTTP requests made through urllib3 in this process. The recorded responses
+    are stored in fixtures_dir under the given name.
+    """
+    global recorder
+    store = FixtureStore(Path(fixtures_dir), name) if mode != "live" else None
+    recorder = Recorder(store, mode, stats_file, latency)
+    recorder.save_stats()
+    original = getattr(HTTPConnectionPool.urlopen, "__wrapped__", HTTPConnectionPool.urlopen)
+    # Retries and redirects call urlopen again from within the recorded request, those are part of that request
+    active = threading.local()
+
+    def urlopen(self, method, url, body=None, headers=None, *args, **kwargs):
+        kwargs.update(zip(urlopen_arguments, args))
+        if getattr(active, "request", False):
+            return original(self, method, url, body=body, headers=headers, **kwargs)
+        active.request = True
+        try:
+            return recorder.urlopen(original, self, method, url, body=body, headers=headers, **kwargs)
+        finally:
+            active.request = False
+
+    urlopen.__wrapped__ = original
+    HTTPConnectionPool.urlopen = urlopen
+    return recorder
+
+
+def uninstall():
+    global recorder
+    HTTPConnectionPool.urlopen = getattr(HTTPConnectionPool.urlopen, "__wrapped__", HTTPConnectionPool.urlopen)
+    recorder = None
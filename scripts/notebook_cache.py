@@ -0,0 +1,127 @@
+"""
+Cache of the pages that mkdocs-jupyter converts (and, with `execute: true`, executes).
+
+Registered as a mkdocs hook (see `hooks` in `mkdocs.yml`). mkdocs-jupyter replaces the `render` method of every
+notebook page with one that converts the notebook with nbconvert. This hook wraps that method: the HTML, table of
+contents and title of the page are stored in .cache/notebooks, keyed by
+
+- the cell types and sources of the notebook, and its stored outputs when it is not executed during the build,
+- the kernel name,
+- the environment lockfile (requirements.txt) and the versions of mkdocs-jupyter, nbconvert and jupytext,
+- the mkdocs-jupyter options in the mkdocs config.
+
+Unchanged notebooks and examples then reuse the stored page instead of being converted again.
+Set OPENML_DOCS_CLEAN=1 to convert all of them again.
+"""
+
+from importlib import metadata
+from pathlib import Path, PurePath
+import hashlib
+import json
+import logging
+import os
+import sys
+
+import jupytext
+from mkdocs.structure.toc import get_toc
+
+sys.path.insert(0, str(Path(__file__).parent))
+import cache_utils
+
+log = logging.getLogger("mkdocs.plugins.notebook_cache")
+
+root = Path(__file__).parent.parent
+cache_dir = root / ".cache" / "notebooks"
+lockfile = root / "requirements.txt"
+
+clean_build = os.environ.get("OPENML_DOCS_CLEAN", "0") == "1"
+
+# Set per build by the hook events below
+env_hash = ""
+dirty_build = False
+used_keys: set[str] = set()
+
+
+def environment_hash(plugin_config) -> str:
+    """
+    Hash of everything besides the notebook itself that changes the converted page.
+    """
+    versions = {package: metadata.version(package) for package in ("mkdocs-jupyter", "nbconvert", "jupytext")}
+    lock = lockfile.read_text() if lockfile.exists() else ""
+    data = json.dumps([dict(plugin_config), versions, lock], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def is_executed(path: str, plugin_config) -> bool:
+    # Same rules as mkdocs-jupyter's on_pre_page
+    if not plugin_config["execute"]:
+        return False
+    return not any(PurePath(path).match(pattern) for pattern in plugin_config["execute_ignore"])
+
+
+def notebook_key(path: str, plugin_config, env_hash: str) -> str:
+    notebook = jupytext.read(path)
+    executed = is_executed(path, plugin_config)
+    kernel_name = plugin_config["kernel_name"] or notebook.metadata.get("kernelspec", {}).get("name", "")
+    digest = hashlib.sha256()
+    digest.update(json.dumps([env_hash, kernel_name, executed]).encode())
+    for cell in notebook.cells:
+        digest.update(json.dumps([cell.cell_type, cell.source, cell.get("metadata", {}).get("tags", [])]).encode())
+        if not executed:
+            # Outputs stored in the notebook end up in the page when it is not executed during the build
+            digest.update(json.dumps(cell.get("outputs", []), sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def on_startup(command, dirty):
+    global dirty_build
+    dirty_build = dirty
+
+
+def on_config(config):
+    global env_hash
+    env_hash = environment_hash(config.plugins["mkdocs-jupyter"].config)
+    used_keys.clear()
+
+
+def on_pre_page(page, config, files):
+    # mkdocs-jupyter sets its own render method on the pages it converts
+    render = page.__dict__.get("render")
+    if render is None:
+        return page
+    plugin_config = config.plugins["mkdocs-jupyter"].config
+
+    def cached_render(config, files):
+        # Keyed on the notebook that is converted at render time, which example_results.py may swap in
+        key = notebook_key(page.file.abs_src_path, plugin_config, env_hash)
+        cache_file = cache_dir / f"{key}.json"
+        used_keys.add(key)
+        if cache_file.exists() and not clean_build:
+            cached = json.loads(cache_file.read_text())
+            page.content = cached["content"]
+            page.toc = get_toc(cached["toc"])
+            if cached["title"] is not None:
+                page.title = cached["title"]
+            return
+        title_before = page.__dict__.get("title")
+        render(config, files)
+        title = page.__dict__.get("title")
+        cached = {
+            "source": page.file.src_uri,
+            "content": page.content,
+            "toc": cache_utils.toc_to_tokens(page.toc.items),
+            "title": title if title != title_before else None,
+        }
+        cache_utils.atomic_write(cache_file, json.dumps(cached))
+
+    page.render = cached_render
+    return page
+
+
+def on_post_build(config):
+    # Dirty builds only render the changed pages, so only a full build knows which entries are still in use
+    if dirty_build or not cache_dir.exists():
+        return
+    for path in cache_dir.glob("*.json"):
+        if path.stem not in used_keys:
+            path.unlink()
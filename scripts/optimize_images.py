@@ -0,0 +1,255 @@
+"""
+Optimize the images in docs/img, and serve them as responsive images.
+
+Registered as a mkdocs hook (see `hooks` in `mkdocs.yml`). For every PNG and JPEG file in docs/img, this
+
+- recompresses it losslessly (with oxipng or jpegtran when installed, otherwise PNGs with Pillow) and ships that
+  copy instead when it is smaller,
+- generates WebP and AVIF variants at several widths up to the width of the image,
+- rewrites the `<img>` tags that show it into `<picture>` elements that offer those variants through `srcset`,
+  and adds the width and height of the image, so the page does not jump around while images load.
+
+The outputs are cached in .cache/images by the hash of the image and the settings below, so only new or changed
+images are processed. Formats that come out larger than the original are left out. To process all images and see
+how much they shrink, without building the docs:
+
+    python scripts/optimize_images.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import shutil
+import subprocess
+import tempfile
+
+try:
+    from PIL import Image, features
+    import PIL
+except ImportError:
+    Image = None
+
+from mkdocs.structure.files import File
+
+log = logging.getLogger("mkdocs.plugins.optimize_images")
+
+root = Path(__file__).parent.parent
+images_dir = root / "docs" / "img"
+cache_dir = root / ".cache" / "images"
+
+# Widths of the variants, images only get the widths below their own width, and their own width
+variant_widths = [480, 960, 1440]
+# Pillow save options of the variants, the most efficient format comes first
+variant_formats = {
+    "avif": {"quality": 60, "speed": 6},
+    "webp": {"quality": 82, "method": 6},
+}
+optimized_suffixes = (".png", ".jpg", ".jpeg")
+# Part of the cache key, bumped when the variants of an image change for the same settings
+variant_version = 2
+
+img_tag = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+tag_attribute = re.compile(r"""([\w-]+)\s*=\s*("[^"]*"|'[^']*'|[^\s"'>]+)""")
+
+# Set per build by on_files: the processed images by the path of the original in the docs
+images: dict[str, dict] = {}
+
+
+def settings_hash() -> str:
+    tools = [bool(shutil.which(tool)) for tool in ("oxipng", "jpegtran")]
+    data = json.dumps([variant_version, variant_widths, variant_formats, tools, PIL.__version__])
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+def same_pixels(first: Path, second: Path) -> bool:
+    with Image.open(first) as a, Image.open(second) as b:
+        return a.mode == b.mode and a.size == b.size and a.tobytes() == b.tobytes()
+
+
+def optimize_lossless(source: Path, target: Path) -> bool:
+    """
+    Write a losslessly recompressed copy of the image to target, and return whether it is smaller than the source.
+    """
+    suffix = source.suffix.lower()
+    try:
+        if suffix == ".png" and shutil.which("oxipng"):
+            subprocess.run(["oxipng", "-o", "4", "--strip", "safe", "--out", str(target), str(source)], check=True, capture_output=True)
+        elif suffix == ".png":
+            with Image.open(source) as image:
+                image.save(target, "PNG", optimize=True, icc_profile=image.info.get("icc_profile"))
+            if not same_pixels(source, target):
+                return False
+        elif shutil.which("jpegtran"):
+            subprocess.run(
+                ["jpegtran", "-copy", "all", "-optimize", "-progressive", "-outfile", str(target), str(source)],
+                check=True,
+                capture_output=True,
+            )
+        else:
+            # Re-encoding a JPEG with Pillow is not lossless
+            return False
+    except (subprocess.CalledProcessError, OSError) as e:
+        log.info(f"Could not recompress {source.name}: {e}")
+        return False
+    return target.exists() and target.stat().st_size < source.stat().st_size
+
+
+def process_image(path: Path) -> dict:
+    """
+    Optimize an image and generate its variants, or take them from the cache. Returns a description of the outputs.
+    """
+    key = f"{hashlib.sha256(path.read_bytes()).hexdigest()}-{settings_hash()}"
+    folder = cache_dir / key
+    meta_file = folder / "meta.json"
+    if meta_file.exists():
+        return json.loads(meta_file.read_text())
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # The variants are made in a temporary folder that is renamed into place at the end, as a whole
+    tmp_dir = Path(tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-"))
+    optimized_name = f"optimized{path.suffix.lower()}"
+    optimized = optimize_lossless(path, tmp_dir / optimized_name)
+    if not optimized:
+        (tmp_dir / optimized_name).unlink(missing_ok=True)
+    original_size = (tmp_dir / optimized_name if optimized else path).stat().st_size
+
+    variants = {}
+    with Image.open(path) as image:
+        width, height = image.size
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        # The variants keep the color profile of the original, so they show the same colors
+        icc_profile = image.info.get("icc_profile")
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        widths = [variant_width for variant_width in variant_widths if variant_width < width] + [width]
+        for fmt, options in variant_formats.items():
+            for variant_width in widths:
+                variant_height = max(1, round(height * variant_width / width))
+                resized = image if variant_width == width else image.resize((variant_width, variant_height), Image.LANCZOS)
+                resized.save(tmp_dir / f"{variant_width}.{fmt}", fmt.upper(), icc_profile=icc_profile, **options)
+            # A format that does not beat the original at full size is not worth offering
+            if (tmp_dir / f"{width}.{fmt}").stat().st_size >= original_size:
+                for variant_width in widths:
+                    (tmp_dir / f"{variant_width}.{fmt}").unlink()
+                continue
+            variants[fmt] = widths
+
+    meta = {
+        "key": key,
+        "width": width,
+        "height": height,
+        "original_size": path.stat().st_size,
+        "optimized": optimized_name if optimized else None,
+        "optimized_size": original_size,
+        "variants": variants,
+        "variant_sizes": {
+            fmt: {str(variant_width): (tmp_dir / f"{variant_width}.{fmt}").stat().st_size for variant_width in widths}
+            for fmt, widths in variants.items()
+        },
+    }
+    (tmp_dir / "meta.json").write_text(json.dumps(meta, indent=2))
+    try:
+        tmp_dir.rename(folder)
+    except OSError:  # processed by another build at the same time
+        shutil.rmtree(tmp_dir)
+    return meta
+
+
+def variant_name(name: str, width: int, fmt: str) -> str:
+    return f"{posixpath.splitext(name)[0]}-{width}w.{fmt}"
+
+
+def process_all(paths: list[Path]) -> list[dict]:
+    with ThreadPoolExecutor(os.cpu_count()) as pool:
+        return list(pool.map(process_image, paths))
+
+
+def on_files(files, config):
+    images.clear()
+    if Image is None or not (features.check("webp") and features.check("avif")):
+        log.warning("Pillow with WebP and AVIF support is not installed, images are not optimized")
+        return files
+    originals = [
+        file for file in files
+        if file.src_uri.startswith("img/") and file.src_uri.lower().endswith(optimized_suffixes) and not file.generated_by
+    ]
+    for file, meta in zip(originals, process_all([Path(file.abs_src_path) for file in originals])):
+        folder = cache_dir / meta["key"]
+        if meta["optimized"]:
+            file.abs_src_path = str(folder / meta["optimized"])
+        for fmt, widths in meta["variants"].items():
+            for width in widths:
+                uri = variant_name(file.src_uri, width, fmt)
+                files.append(File.generated(config, uri, abs_src_path=str(folder / f"{width}.{fmt}")))
+        images[file.src_uri] = meta
+    return files
+
+
+def responsive_img(tag: str, page) -> str:
+    """
+    Turn an `<img>` tag that shows a processed image into a `<picture>` with its variants.
+    """
+    attributes = {name.lower(): value.strip("\"'") for name, value in tag_attribute.findall(tag)}
+    src = attributes.get("src", "")
+    if "srcset" in attributes or urlsplit(src).scheme or src.startswith(("//", "/")):
+        return tag
+    src_path = urlsplit(src).path
+    meta = images.get(urljoin("/" + page.url, src_path).lstrip("/"))
+    if meta is None:
+        return tag
+
+    width, height = meta["width"], meta["height"]
+    end = "/>" if tag.endswith("/>") else ">"
+    new_tag = tag[: -len(end)].rstrip()
+    display_width = attributes.get("width", "")
+    if "width" not in attributes and "height" not in attributes:
+        new_tag += f' width="{width}" height="{height}"'
+    elif display_width.isdigit() and "height" not in attributes:
+        new_tag += f' height="{round(int(display_width) * height / width)}"'
+    new_tag += " />" if end == "/>" else ">"
+    if not meta["variants"]:
+        return new_tag
+
+    sizes = f"{display_width}px" if display_width.isdigit() else f"(max-width: {width}px) 100vw, {width}px"
+    sources = []
+    for fmt, widths in meta["variants"].items():
+        srcset = ", ".join(f"{variant_name(src_path, variant_width, fmt)} {variant_width}w" for variant_width in widths)
+        sources.append(f'<source type="image/{fmt}" srcset="{srcset}" sizes="{sizes}">')
+    return f"<picture>{''.join(sources)}{new_tag}</picture>"
+
+
+def on_page_content(html, page, config, files):
+    if not images:
+        return html
+    return img_tag.sub(lambda match: responsive_img(match.group(0), page), html)
+
+
+def main():
+    if Image is None:
+        raise SystemExit("Pillow is not installed")
+    paths = sorted(path for path in images_dir.iterdir() if path.suffix.lower() in optimized_suffixes)
+    total_original = total_optimized = total_webp = total_avif = 0
+    print(f"{'image':<32} {'original':>10} {'optimized':>10} {'webp':>10} {'avif':>10}")
+    for path, meta in zip(paths, process_all(paths)):
+        full_size = {fmt: sizes[str(meta["width"])] for fmt, sizes in meta["variant_sizes"].items()}
+        total_original += meta["original_size"]
+        total_optimized += meta["optimized_size"]
+        total_webp += full_size.get("webp", meta["optimized_size"])
+        total_avif += full_size.get("avif", meta["optimized_size"])
+        print(
+            f"{path.name[:32]:<32} {meta['original_size'] / 1024:>8.0f}KB {meta['optimized_size'] / 1024:>8.0f}KB "
+            f"{full_size.get('webp', 0) / 1024:>8.0f}KB {full_size.get('avif', 0) / 1024:>8.0f}KB"
+        )
+    print(
+        f"{'total':<32} {total_original / 2**20:>8.1f}MB {total_optimized / 2**20:>8.1f}MB "
+        f"{total_webp / 2**20:>8.1f}MB {total_avif / 2**20:>8.1f}MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Render API reference pages in parallel and store them in the rendered page cache (see reference_cache.py).
+
+mkdocs renders pages one after another, and mkdocstrings is by far the slowest part of that for the reference pages.
+`gen_python_ref_pages.py` calls `prerender()` for every module that is not cached yet. Each worker process loads
+the mkdocs config, sets up only the autorefs and mkdocstrings plugins, and renders its share of the `::: identifier`
+pages. mkdocs then splices the cached HTML in. Pages that fail to render here are simply rendered by mkdocs itself.
+
+Set OPENML_DOCS_RENDER_PROCESSES to the number of worker processes (default: number of CPUs), 0 disables pre-rendering.
+
+It can also be run on its own to warm the cache, e.g. in CI, once the Python docs were imported into `openml/`:
+
+    python scripts/prerender_reference.py -f mkdocs.yml
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from markdown import Markdown
+from mkdocs.config import load_config
+from mkdocs.structure.files import File
+from mkdocs.structure.toc import get_toc
+
+sys.path.insert(0, str(Path(__file__).parent))
+import reference_cache
+
+log = logging.getLogger("mkdocs.plugins.prerender_reference")
+
+# Set up once per worker process by init_worker
+worker_config = None
+
+
+def render_processes() -> int:
+    return int(os.environ.get("OPENML_DOCS_RENDER_PROCESSES", os.cpu_count() or 1))
+
+
+def init_worker(config_file: str):
+    """
+    Load the mkdocs config and run the on_config event of the plugins that take part in rendering `:::` blocks.
+    """
+    global worker_config
+    config = load_config(config_file)
+    for name, plugin in config.plugins.items():
+        if name in ("autorefs", "mkdocstrings"):
+            config = plugin.on_config(config) or config
+    worker_config = config
+
+
+def render_page(page: tuple[str, str, str]) -> tuple[str, dict | None, str | None]:
+    """
+    Render a single reference page, like mkdocs would, and return its cache key and fragment or the error.
+    """
+    key, identifier, doc_path = page
+    config = worker_config
+    url = File(doc_path, config.docs_dir, config.site_dir, config.use_directory_urls).url
+    autorefs = config.plugins["autorefs"]
+    handlers = config.plugins["mkdocstrings"].handlers
+    autorefs.current_page = url
+    try:
+        md = Markdown(extensions=config.markdown_extensions, extension_configs=config.mdx_configs or {})
+        html = md.convert(f"::: {identifier}")
+        toc = get_toc(getattr(md, "toc_tokens", []))
+    except Exception as e:
+        return key, None, f"{type(e).__name__}: {e}"
+    # No title: mkdocs only takes it from an h1 that comes first, and mkdocstrings wraps its headings in a div
+    fragment = reference_cache.page_fragment(html, toc.items, url, autorefs, handlers)
+    if fragment is None:
+        return key, None, "mkdocs-autorefs has no _url_map"
+    return key, fragment, None
+
+
+def prerender(config_file: str, pages: list[tuple[str, str, str]], processes: int | None = None) -> int:
+    """
+    Render (cache key, identifier, page path) pages in a process pool and store them in the cache.
+    Returns the number of pages that were rendered.
+    """
+    processes = render_processes() if processes is None else processes
+    if processes < 1 or not pages:
+        return 0
+    processes = min(processes, len(pages))
+
+    start = time.perf_counter()
+    rendered = 0
+    # Spawn, so workers do not inherit the state of the running mkdocs build
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(processes, mp_context=context, initializer=init_worker, initargs=(config_file,)) as pool:
+        chunksize = max(1, len(pages) // (processes * 4))
+        for key, fragment, error in pool.map(render_page, pages, chunksize=chunksize):
+            if fragment is None:
+                log.warning(f"Could not pre-render reference page {key}: {error}")
+                continue
+            reference_cache.store_fragment(key, fragment)
+            rendered += 1
+    log.info(
+        f"Pre-rendered {rendered} of {len(pages)} reference pages with {processes} processes "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return rendered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-f", "--config-file", default=str(reference_cache.root / "mkdocs.yml"))
+    parser.add_argument("-j", "--processes", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-7s -  %(message)s")
+
+    init_worker(args.config_file)
+    options_hash = reference_cache.handler_options_hash(worker_config)
+    pages = []
+    for path, identifier, doc_path in reference_cache.module_pages(reference_cache.root / "openml"):
+        key = reference_cache.cache_key(identifier, reference_cache.file_digest(path), options_hash)
+        if not reference_cache.has_fragment(key):
+            pages.append((key, identifier, doc_path.as_posix()))
+    prerender(args.config_file, pages, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Profile a mkdocs build: where does the time go, and which plugins and pages use the most memory?
+
+Wraps the mkdocs command line, so it takes the same arguments:
+
+    python scripts/profile_build.py build
+    python scripts/profile_build.py serve -f mkdocs-local.yml
+
+Every event of every plugin (multirepo imports, gen-files scripts, mkdocs-jupyter, mkdocstrings, the git plugins,
+search indexing, ...) and every page is timed. For every build, this writes two files to .cache/profile:
+
+- `build-<time>.json`: a report with the wall time and peak memory per plugin, event and page.
+- `build-<time>.trace.json`: all timings as a trace in the Chrome trace event format, which can be opened as a
+  flamegraph in https://www.speedscope.app, https://ui.perfetto.dev or chrome://tracing.
+
+Memory is measured as the growth of the peak resident set size of the process during each step.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import json
+import logging
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import mkdocs.commands.build
+import mkdocs.config
+from mkdocs.plugins import PluginCollection
+from mkdocs.structure.pages import Page
+
+log = logging.getLogger("mkdocs.plugins.profile_build")
+
+output_dir = Path(__file__).parent.parent / ".cache" / "profile"
+
+
+def peak_rss() -> int:
+    """
+    Peak resident set size of this process so far, in bytes, or 0 where that is not available.
+    """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Profiler:
+    """
+    Collects the timed spans of a single build.
+    """
+
+    def __init__(self):
+        self.spans: list[dict] = []
+        self.start = time.perf_counter_ns()
+        self.started_at = datetime.now()
+        self.start_rss = peak_rss()
+
+    @contextmanager
+    def span(self, name: str, category: str, **args):
+        start = time.perf_counter_ns()
+        rss_before = peak_rss()
+        try:
+            yield
+        finally:
+            self.spans.append({
+                "name": name,
+                "cat": category,
+                "start": start - self.start,
+                "duration": time.perf_counter_ns() - start,
+                "rss_growth": peak_rss() - rss_before,
+                "args": args,
+            })
+
+    def trace(self) -> dict:
+        events = [
+            {
+                "name": span["name"],
+                "cat": span["cat"],
+                "ph": "X",
+                "ts": span["start"] / 1000,
+                "dur": span["duration"] / 1000,
+                "pid": 1,
+                "tid": 1,
+                "args": {**span["args"], "peak_rss_growth_mb": span["rss_growth"] / 2**20},
+            }
+            for span in self.spans
+        ]
+        return {"traceEvents": sorted(events, key=lambda event: event["ts"]), "displayTimeUnit": "ms"}
+
+    def report(self, wall_time: int) -> dict:
+        plugins: dict[str, dict] = {}
+        pages: dict[str, dict] = {}
+        phases: dict[str, float] = {}
+        for span in self.spans:
+            seconds = span["duration"] / 1e9
+            if span["cat"] == "plugin":
+                plugin = plugins.setdefault(span["args"]["plugin"], {"total_s": 0.0, "peak_rss_growth_mb": 0.0, "events": {}})
+                event = plugin["events"].setdefault(span["args"]["event"], {"calls": 0, "total_s": 0.0})
+                plugin["total_s"] += seconds
+                plugin["peak_rss_growth_mb"] += span["rss_growth"] / 2**20
+                event["calls"] += 1
+                event["total_s"] += seconds
+            elif span["cat"] == "page":
+                page = pages.setdefault(span["args"]["page"], {"page": span["args"]["page"], "total_s": 0.0, "peak_rss_growth_mb": 0.0})
+                page[f"{span['name']}_s"] = page.get(f"{span['name']}_s", 0.0) + seconds
+                if span["name"] != "render":  # render is part of populate
+                    page["total_s"] += seconds
+                    page["peak_rss_growth_mb"] += span["rss_growth"] / 2**20
+            else:
+                phases[span["name"]] = phases.get(span["name"], 0.0) + seconds
+        return {
+            "command": sys.argv,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_time_s": wall_time / 1e9,
+            "peak_rss_mb": peak_rss() / 2**20,
+            "peak_rss_growth_mb": (peak_rss() - self.start_rss) / 2**20,
+            "phases": phases,
+            "plugins": dict(sorted(plugins.items(), key=lambda item: item[1]["total_s"], reverse=True)),
+            "pages": sorted(pages.values(), key=lambda page: page["total_s"], reverse=True),
+        }
+
+    def write(self):
+        wall_time = time.perf_counter_ns() - self.start
+        output_dir.mkdir(parents=True, exist_ok=True)
+        name = f"build-{self.started_at:%Y%m%d-%H%M%S}"
+        report = self.report(wall_time)
+        (output_dir / f"{name}.json").write_text(json.dumps(report, indent=2))
+        (output_dir / f"{name}.trace.json").write_text(json.dumps(self.trace()))
+        slowest = ", ".join(f"{plugin} {info['total_s']:.1f}s" for plugin, info in list(report["plugins"].items())[:5])
+        log.info(f"Build profile written to {output_dir / name}.json, slowest plugins: {slowest}")
+
+
+# The profiler of the build that is running. Config loading happens before the build starts, so its time is
+# recorded by a profiler that the next build then takes over.
+profiler = Profiler()
+
+
+def profile_run_event(self: PluginCollection, name: str, item=None, **kwargs):
+    # Same as PluginCollection.run_event, but with every method call timed
+    pass_item = item is not None
+    page = kwargs.get("page", item if isinstance(item, Page) else None)
+    for method in self.events[name]:
+        self._current_plugin = self._event_origins.get(method, "<unknown>")
+        args = {"plugin": self._current_plugin, "event": name}
+        if page is not None:
+            args["page"] = page.file.src_uri
+        with profiler.span(f"{self._current_plugin}:{name}", "plugin", **args):
+            if pass_item:
+                result = method(item, **kwargs)
+            else:
+                result = method(**kwargs)
+        # keep item if method returned `None`
+        if result is not None:
+            item = result
+    self._current_plugin = None
+    return item
+
+
+def wrap(function, name: str, category: str, page_arg: bool = False):
+    def wrapper(*args, **kwargs):
+        span_args = {"page": args[0].file.src_uri} if page_arg else {}
+        with profiler.span(name, category, **span_args):
+            return function(*args, **kwargs)
+    wrapper.__wrapped__ = function
+    return wrapper
+
+
+def wrap_build(build):
+    def profiled_build(*args, **kwargs):
+        global profiler
+        try:
+            with profiler.span("build", "phase"):
+                return build(*args, **kwargs)
+        finally:
+            profiler.write()
+            profiler = Profiler()
+    profiled_build.__wrapped__ = build
+    return profiled_build
+
+
+def install():
+    """
+    Patch mkdocs so builds are profiled.
+    """
+    PluginCollection.run_event = profile_run_event
+    mkdocs.config.load_config = wrap(mkdocs.config.load_config, "load_config", "phase")
+    build_module = mkdocs.commands.build
+    build_module._populate_page = wrap(build_module._populate_page, "populate", "page", page_arg=True)
+    build_module._build_page = wrap(build_module._build_page, "build", "page", page_arg=True)
+    build_module.build = wrap_build(build_module.build)
+    Page.render = wrap(Page.render, "render", "page", page_arg=True)
+
+
+if __name__ == "__main__":
+    install()
+    # Imported after patching, so `mkdocs serve` picks up the profiled build function
+    from mkdocs.__main__ import cli
+
+    sys.argv[0] = "mkdocs"
+    cli()
@@ -0,0 +1,202 @@
+"""
+Cache of rendered API reference pages.
+
+`gen_python_ref_pages.py` keeps a manifest of every module it generates a reference page for
+(module path -> source hash -> generated page hash). Modules whose source did not change since the last
+build, and whose rendered HTML is in the cache, get a placeholder page instead of a `::: identifier` block,
+so mkdocstrings does not render them again. This file is also registered as a mkdocs hook (see `hooks` in
+`mkdocs.yml`): it stores freshly rendered reference pages in the cache and splices cached pages back in,
+including their table of contents, autorefs anchors and inventory entries.
+
+Cached HTML only depends on the source of its own module, so set OPENML_DOCS_CLEAN=1 to render all pages
+again when e.g. an inherited docstring changed.
+"""
+
+from importlib import metadata
+from pathlib import Path
+import hashlib
+import json
+import logging
+import re
+import sys
+
+from mkdocs.structure.toc import AnchorLink, get_toc
+
+sys.path.insert(0, str(Path(__file__).parent))
+import cache_utils
+
+log = logging.getLogger("mkdocs.plugins.reference_cache")
+
+root = Path(__file__).parent.parent
+cache_dir = root / ".cache" / "reference"
+manifest_file = cache_dir / "manifest.json"
+fragments_dir = cache_dir / "fragments"
+
+# Placeholders emitted by gen_python_ref_pages.py, as HTML comments so they survive the markdown conversion
+marker_re = re.compile(r"<!-- reference-cache: (store|load) (\w+) -->")
+# Part of the cache key, bump it when the fragments change
+fragment_version = 2
+
+# Set per build by on_config: whether autorefs exposes the anchors that the fragments need
+cache_supported = True
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def handler_options_hash(config) -> str:
+    """
+    Hash of everything besides the module source that changes the rendered HTML: the mkdocstrings
+    handler configuration in mkdocs.yml and the versions of the packages that render it.
+    """
+    handlers = config.plugins["mkdocstrings"].config["handlers"]
+    packages = ("mkdocstrings", "mkdocstrings-python", "mkdocs-autorefs")
+    versions = {package: metadata.version(package) for package in packages}
+    return text_digest(json.dumps([handlers, versions, fragment_version], sort_keys=True, default=str))
+
+
+def cache_key(identifier: str, source_hash: str, options_hash: str) -> str:
+    return text_digest(f"{identifier}:{source_hash}:{options_hash}")
+
+
+def load_manifest() -> dict[str, dict]:
+    if not manifest_file.exists():
+        return {}
+    return json.loads(manifest_file.read_text())
+
+
+def save_manifest(manifest: dict[str, dict]):
+    cache_utils.atomic_write(manifest_file, json.dumps(manifest, indent=1, sort_keys=True))
+
+
+def fragment_path(key: str) -> Path:
+    return fragments_dir / f"{key}.json"
+
+
+def has_fragment(key: str) -> bool:
+    return fragment_path(key).exists()
+
+
+def load_fragment(key: str) -> dict:
+    return json.loads(fragment_path(key).read_text())
+
+
+def store_fragment(key: str, fragment: dict):
+    cache_utils.atomic_write(fragment_path(key), json.dumps(fragment))
+
+
+def prune_fragments(keep: set[str]):
+    """
+    Remove cached fragments of modules that changed or no longer exist.
+    """
+    if not fragments_dir.exists():
+        return
+    for path in fragments_dir.glob("*.json"):
+        if path.stem not in keep:
+            path.unlink()
+
+
+def module_pages(src: Path) -> list[tuple[Path, str, Path]]:
+    """
+    The modules of a package that get a reference page, as (source file, identifier, page path relative to docs).
+    """
+    pages = []
+    for path in sorted(src.rglob("*.py")):
+        parts = tuple(path.relative_to(src.parent).with_suffix("").parts)
+        doc_path = Path("reference", path.relative_to(src).with_suffix(".md"))
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+            doc_path = doc_path.with_name("index.md")
+        elif parts[-1] == "__main__":
+            continue
+        pages.append((path, ".".join(parts), doc_path))
+    return pages
+
+
+def url_map(autorefs) -> dict | None:
+    """
+    The URLs of the anchors autorefs registered, by identifier. autorefs has no public API for them, so they are read
+    from its private `_url_map` (mkdocs-autorefs is pinned in requirements.txt). Returns None when a release no longer
+    has it, and the reference pages are then rendered without the cache.
+    """
+    anchors = getattr(autorefs, "_url_map", None)
+    return anchors if isinstance(anchors, dict) else None
+
+
+def page_fragment(
+    html: str, toc_items: list[AnchorLink], page_url: str, autorefs, handlers, title: str | None = None
+) -> dict | None:
+    """
+    Everything needed to splice a rendered reference page back into a later build: its HTML, table of contents,
+    title (when it came from the page itself), and the autorefs anchors and inventory entries mkdocstrings
+    registered while rendering it. Returns None when the anchors cannot be read, see url_map().
+    """
+    anchor_urls = url_map(autorefs)
+    if anchor_urls is None:
+        return None
+    page_prefix = f"{page_url}#"
+    anchors = [
+        [identifier, url[len(page_prefix):]]
+        for identifier, urls in anchor_urls.items()
+        for url in urls
+        if url.startswith(page_prefix)
+    ]
+    inventory = [
+        [item.name, item.domain, item.role, item.uri[len(page_prefix):], item.priority, item.dispname]
+        for item in handlers.inventory.values()
+        if item.uri.startswith(page_prefix)
+    ]
+    return {
+        "html": html,
+        "toc": cache_utils.toc_to_tokens(toc_items),
+        "title": title,
+        "anchors": anchors,
+        "inventory": inventory,
+    }
+
+
+def has_own_title(page) -> bool:
+    # A title from the nav or the page metadata, which mkdocs prefers over the first heading of the page
+    return "title" in page.__dict__ or "title" in page.meta
+
+
+def on_config(config):
+    global cache_supported
+    cache_supported = "autorefs" in config.plugins and url_map(config.plugins["autorefs"]) is not None
+    if not cache_supported:
+        log.warning("This version of mkdocs-autorefs has no _url_map, reference pages are rendered without the cache")
+
+
+def on_page_content(html: str, page, config, files) -> str:
+    match = marker_re.search(html)
+    if match is None:
+        return html
+    action, key = match.groups()
+    autorefs = config.plugins["autorefs"]
+    handlers = config.plugins["mkdocstrings"].handlers
+    page_prefix = f"{page.url}#"
+
+    if action == "store":
+        html = marker_re.sub("", html)
+        if cache_supported:
+            title = None if has_own_title(page) else page.title
+            store_fragment(key, page_fragment(html, page.toc.items, page.url, autorefs, handlers, title))
+        return html
+
+    fragment = load_fragment(key)
+    page.toc = get_toc(fragment["toc"])
+    # The placeholder has no heading of its own, so mkdocs would take the title from the file name
+    if fragment["title"] is not None and not has_own_title(page):
+        page.title = fragment["title"]
+    for identifier, anchor in fragment["anchors"]:
+        autorefs.register_anchor(page.url, identifier, anchor)
+    # Mark the handler as used, so the inventory is still written when every page came from the cache
+    handlers.get_handler("python")
+    for name, domain, role, anchor, priority, dispname in fragment["inventory"]:
+        handlers.inventory.register(name, domain, role, page_prefix + anchor, priority, dispname)
+    return marker_re.sub(lambda _: fragment["html"], html)
@@ -0,0 +1,251 @@
+"""
+Local mirror of the repositories that the multirepo plugin imports docs from.
+
+Registered as a mkdocs hook (see `hooks` in `mkdocs.yml`). On every build, the multirepo plugin deletes the
+repositories in temp_dir and clones them again (shallow and sparse), even when nothing changed. This hook replaces its
+clone step with a mirror of every repository in .cache/repos, which
+
+- is a shallow, blobless git checkout with only the paths the plugin imports (the `imports` of `nav_repos`, or the
+  docs folder and `extra_imports` of a `!import` in the nav),
+- is updated with a `git fetch` of the branch, which only downloads the commit and the files that changed,
+- is only copied to temp_dir when the commit the branch points to (or the imported paths) changed since the last
+  import. The imported commit of every repository is recorded in .cache/repos/imported.json.
+
+Set OPENML_DOCS_OFFLINE=1 to build without network access, from the commits that are in the mirror. When a fetch
+fails, the build also falls back to the mirror, with a warning. Set OPENML_DOCS_CLEAN=1 to copy every repository
+to temp_dir again.
+"""
+
+from pathlib import Path
+from urllib.parse import urlsplit
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+from mkdocs.exceptions import PluginError
+from mkdocs.plugins import event_priority
+
+sys.path.insert(0, str(Path(__file__).parent))
+import cache_utils
+
+try:
+    from mkdocs_multirepo_plugin.structure import DocsRepo, Repo
+except ImportError:
+    DocsRepo = Repo = None
+
+log = logging.getLogger("mkdocs.plugins.repo_mirror")
+
+root = Path(__file__).parent.parent
+mirrors_dir = root / ".cache" / "repos"
+imported_file = mirrors_dir / "imported.json"
+
+clean_build = os.environ.get("OPENML_DOCS_CLEAN", "0") == "1"
+offline = os.environ.get("OPENML_DOCS_OFFLINE", "0") == "1"
+
+# Set per build by on_config: the imported commit and paths of every repository by name
+imported: dict[str, dict] = {}
+# Set per build: the commit of every mirror, so a repository imported twice is only fetched once
+resolved: dict[Path, str] = {}
+# The repositories are imported concurrently, from threads
+mirror_locks: dict[Path, threading.RLock] = {}
+
+
+def git(mirror: Path, *args: str, url: str | None = None) -> str:
+    """
+    Run git in the mirror. With the url of the repository, the access token of the multirepo plugin (if set) is
+    used for it, without storing it in the mirror.
+    """
+    options = []
+    if url is not None and authenticated_url(url) != url:
+        options += ["-c", f"url.{authenticated_url(url)}.insteadOf={url}"]
+    if url is not None and os.environ.get("AccessToken"):
+        options += ["-c", f"http.extraheader=AUTHORIZATION: bearer {os.environ['AccessToken']}"]
+    return subprocess.run(
+        ["git", *options, *args], cwd=mirror, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def authenticated_url(url: str) -> str:
+    """
+    The url with the access token of the multirepo plugin, see its sparse_clone.sh.
+    """
+    scheme, rest = url.split("://", 1)
+    if os.environ.get("AccessToken"):
+        return f"{scheme}://{os.environ['AccessToken']}@{rest}"
+    if os.environ.get("GithubAccessToken"):
+        return f"{scheme}://x-access-token:{os.environ['GithubAccessToken']}@{rest}"
+    if os.environ.get("GitlabCIJobToken"):
+        return f"{scheme}://gitlab-ci-token:{os.environ['GitlabCIJobToken']}@{rest}"
+    return url
+
+
+def mirror_path(url: str, branch: str) -> Path:
+    parts = urlsplit(url)
+    name = re.sub(r"[^\w.-]+", "-", f"{parts.netloc}{parts.path.removesuffix('.git')}-{branch}").strip("-")
+    return mirrors_dir / name
+
+
+def mirror_lock(mirror: Path) -> threading.RLock:
+    return mirror_locks.setdefault(mirror, threading.RLock())
+
+
+def update_mirror(url: str, branch: str) -> tuple[Path, str]:
+    """
+    Fetch the branch into the mirror of the repository, and return the mirror and the commit the branch points to.
+    """
+    mirror = mirror_path(url, branch)
+    with mirror_lock(mirror):
+        if mirror in resolved:
+            return mirror, resolved[mirror]
+        has_commit = (mirror / ".git").is_dir() and subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", "HEAD"], cwd=mirror, capture_output=True
+        ).returncode == 0
+        if offline:
+            if not has_commit:
+                raise PluginError(f"There is no mirror of {url} to build offline from, build online once first")
+            resolved[mirror] = git(mirror, "rev-parse", "HEAD")
+            return mirror, resolved[mirror]
+        if not (mirror / ".git").is_dir():
+            mirror.mkdir(parents=True, exist_ok=True)
+            git(mirror, "init", "--quiet")
+            git(mirror, "remote", "add", "origin", url)
+            # A partial clone: files are only downloaded when they are checked out
+            git(mirror, "config", "remote.origin.promisor", "true")
+            git(mirror, "config", "remote.origin.partialclonefilter", "blob:none")
+        try:
+            git(mirror, "fetch", "--quiet", "--depth", "1", "--filter=blob:none", "origin", branch, url=url)
+            resolved[mirror] = git(mirror, "rev-parse", "FETCH_HEAD")
+        except subprocess.CalledProcessError as e:
+            if not has_commit:
+                raise PluginError(f"Could not fetch {branch} of {url}: {e.stderr.strip()}")
+            resolved[mirror] = git(mirror, "rev-parse", "HEAD")
+            log.warning(f"Could not fetch {branch} of {url}, using the mirrored commit {resolved[mirror][:10]}")
+        return mirror, resolved[mirror]
+
+
+def export(mirror: Path, commit: str, paths: list[str], target: Path, url: str):
+    """
+    Check out the paths of the commit in the mirror, and copy them to target, without the git folder.
+    """
+    git(mirror, "sparse-checkout", "set", "--no-cone", *paths)
+    # Only downloads the files of the paths that are not in the mirror yet
+    git(mirror, "checkout", "--quiet", "--detach", commit, url=url)
+    shutil.rmtree(target, ignore_errors=True)
+    shutil.copytree(mirror, target, ignore=shutil.ignore_patterns(".git"), symlinks=True)
+
+
+def load_imported() -> dict[str, dict]:
+    if clean_build or not imported_file.exists():
+        return {}
+    return json.loads(imported_file.read_text())
+
+
+def save_imported():
+    cache_utils.atomic_write(imported_file, json.dumps(imported, indent=1, sort_keys=True))
+
+
+def is_current(repo, commit: str, paths: list[str], step: str) -> bool:
+    record = imported.get(repo.name)
+    return (
+        record is not None
+        and repo.location.is_dir()
+        and record["url"] == repo.url
+        and record["commit"] == commit
+        and record["paths"] == paths
+        and record.get("step") == step
+    )
+
+
+def sparse_paths(paths: list[str]) -> list[str]:
+    """
+    The patterns to check out. An entry can hold several, separated by whitespace: YAML reads the `imports` list in
+    mkdocs.yml as one string, which the plugin's sparse_clone.sh splits by passing it to git unquoted.
+    """
+    return [pattern for path in paths for pattern in path.split()]
+
+
+def import_repo(repo, paths: list[str]):
+    paths = sparse_paths(paths)
+    with mirror_lock(mirror_path(repo.url, repo.branch)):
+        mirror, commit = update_mirror(repo.url, repo.branch)
+        if is_current(repo, commit, paths, "clone"):
+            log.info(f"{repo.name} is still at {commit[:10]}, not copied")
+            return
+        start = time.perf_counter()
+        export(mirror, commit, paths, repo.location, repo.url)
+        imported[repo.name] = {
+            "url": repo.url, "branch": repo.branch, "commit": commit, "paths": paths, "step": "clone"
+        }
+        log.info(f"Imported {repo.name} at {commit[:10]} in {time.perf_counter() - start:.1f}s")
+
+
+async def sparse_clone(self, paths: list[str] = None):
+    """
+    Replaces Repo.sparse_clone: copy the repository from the mirror, unless the imported commit did not change.
+    """
+    await asyncio.to_thread(import_repo, self, list(paths or self.paths))
+    return self
+
+
+def delete_repo(self):
+    """
+    Replaces Repo.delete_repo, which the plugin calls before every clone: sparse_clone replaces the folder when needed.
+    """
+
+
+def import_docs(original):
+    async def mirrored_import_docs(self, remove_existing: bool = True, keep_docs_dir: bool = False):
+        # The docs are moved around after the clone, so an unchanged import is skipped as a whole
+        settings = [
+            self.docs_dir,
+            self.config,
+            *self.extra_imports,
+            f"multi_docs={self.multi_docs}",
+            f"keep_docs_dir={self.keep_docs_dir(global_keep_docs_dir=keep_docs_dir)}",
+        ]
+        _, commit = await asyncio.to_thread(update_mirror, self.url, self.branch)
+        if is_current(self, commit, settings, "import"):
+            log.info(f"{self.name} is still at {commit[:10]}, not copied")
+            self.src_path_map = imported[self.name]["src_path_map"]
+            return self
+        imported.pop(self.name, None)
+        await original(self, remove_existing, keep_docs_dir)
+        imported[self.name] = {
+            "url": self.url,
+            "branch": self.branch,
+            "commit": commit,
+            "paths": settings,
+            "step": "import",
+            "src_path_map": self.src_path_map,
+        }
+        return self
+
+    mirrored_import_docs.__wrapped__ = original
+    return mirrored_import_docs
+
+
+# Before the multirepo plugin, which imports the repositories in its on_config
+@event_priority(100)
+def on_config(config):
+    if "multirepo" not in config.plugins or Repo is None:
+        return
+    imported.clear()
+    imported.update(load_imported())
+    resolved.clear()
+    # The plugin creates its repositories inside on_config, so the methods are replaced on the classes
+    Repo.sparse_clone = sparse_clone
+    Repo.delete_repo = delete_repo
+    DocsRepo.import_docs = import_docs(getattr(DocsRepo.import_docs, "__wrapped__", DocsRepo.import_docs))
+
+
+def on_pre_build(config):
+    # After the multirepo plugin imported the repositories in its on_config
+    if "multirepo" in config.plugins and Repo is not None:
+        save_imported()
@@ -0,0 +1,429 @@
+"""
+Run the example scripts in docs/examples and store their outputs, so the docs can show them without running them.
+
+Every example runs in its own worker process (and Jupyter kernel), a few at a time:
+
+    python scripts/run_examples.py
+    python scripts/run_examples.py 20_basic/introduction_tutorial.py --jobs 2 --timeout 300 --memory-limit 2048
+
+Each worker converts the script to a notebook with jupytext and executes it cell by cell with nbclient. The time
+limit applies to the whole example (every cell gets what is left of it), the memory limit (the address space of the
+worker and its kernel) is set with setrlimit where the platform supports it. Printed output, figures and the time every cell took are captured.
+
+Results go into a content-addressed store in .cache/examples:
+
+- `objects/`: the executed notebook, stdout, stderr and every figure, stored under the hash of their content.
+- `results/<key>.json`: the result of an example (status, timings, memory, and the objects above), keyed by the
+  hash of the example source, the environment lockfile (requirements.txt), the Python version and the `--http` mode
+  of runs that record or replay responses.
+
+Examples whose key already has a successful result are skipped unless `--force` is given, failed examples are
+run again. The docs build picks up the executed notebooks of successful runs through the example_results.py hook.
+
+The examples talk to the live OpenML server. To run them without network, record their responses once and replay
+them afterwards (see http_replay.py); either way the bandwidth every example used is part of its result:
+
+    python scripts/run_examples.py --http record --force
+    python scripts/run_examples.py --http replay --force
+    python scripts/run_examples.py --http replay --latency 1 --force   # as slow as the recorded responses
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import cache_utils
+
+scripts_dir = Path(__file__).parent
+root = scripts_dir.parent
+examples_dir = root / "docs" / "examples"
+store_dir = root / ".cache" / "examples"
+# Recorded HTTP responses of every example, see http_replay.py
+fixtures_dir = root / ".cache" / "http_fixtures"
+lockfile = root / "requirements.txt"
+
+kernel_name = "python3"
+# Extra time the worker gets on top of the example time limit, to start and stop its kernel
+startup_grace = 60
+# Time a worker that ran out of time gets to stop its kernel, after it is asked to stop
+stop_grace = 10
+# Colors in the tracebacks of the kernel
+ansi_escape = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def example_key(path: Path, http_mode: str | None = None) -> str:
+    """
+    Key of the stored result of an example: changes when the example or the environment it runs in changes.
+    Runs that record or replay the OpenML responses are stored apart from the live runs that the docs show.
+    """
+    digest = hashlib.sha256()
+    digest.update(path.read_bytes())
+    digest.update(lockfile.read_bytes() if lockfile.exists() else b"")
+    digest.update(json.dumps([sys.version, kernel_name]).encode())
+    # Only counting the requests (live) does not change what the example does
+    if http_mode not in (None, "live"):
+        digest.update(http_mode.encode())
+    return digest.hexdigest()
+
+
+def example_name(path: Path) -> str:
+    return path.relative_to(examples_dir).with_suffix("").as_posix()
+
+
+def object_path(name: str) -> Path:
+    return store_dir / "objects" / name[:2] / name
+
+
+def store_object(data: bytes, suffix: str = "") -> str:
+    """
+    Store data under the hash of its content and return the name of the object.
+    """
+    name = hashlib.sha256(data).hexdigest() + suffix
+    path = object_path(name)
+    if not path.exists():
+        cache_utils.atomic_write(path, data)
+    return name
+
+
+def result_path(key: str) -> Path:
+    return store_dir / "results" / f"{key}.json"
+
+
+def load_result(key: str) -> dict | None:
+    path = result_path(key)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def save_result(key: str, result: dict):
+    cache_utils.atomic_write(result_path(key), json.dumps(result, indent=2))
+
+
+def find_examples(patterns: list[str]) -> list[Path]:
+    """
+    All example scripts, or those matching one of the given paths or glob patterns (relative to docs/examples).
+    """
+    examples = sorted(examples_dir.glob("*/*.py"))
+    if not patterns:
+        return examples
+    return [
+        path for path in examples
+        if any(path.relative_to(examples_dir).match(pattern) or path.name == pattern for pattern in patterns)
+    ]
+
+
+def max_rss(usage) -> int:
+    # Linux reports kilobytes, macOS bytes
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def limit_memory(megabytes: int):
+    if resource is None or megabytes <= 0:
+        return
+    limit = megabytes * 2**20
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError, AttributeError):  # not supported on macOS
+        pass
+
+
+def cell_timings(notebook) -> list[dict]:
+    """
+    Execution time of every code cell, from the timestamps nbclient records.
+    """
+    timings = []
+    for index, cell in enumerate(notebook.cells):
+        execution = cell.get("metadata", {}).get("execution", {})
+        if cell.cell_type != "code" or "shell.execute_reply" not in execution:
+            continue
+        start = datetime.fromisoformat(execution["iopub.execute_input"].replace("Z", "+00:00"))
+        end = datetime.fromisoformat(execution["shell.execute_reply"].replace("Z", "+00:00"))
+        timings.append({"cell": index, "time_s": (end - start).total_seconds()})
+    return timings
+
+
+def kill_process_group(pgid: int | None):
+    if pgid is None:
+        return
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):  # stopped already
+        pass
+
+
+def run_worker(
+    example: Path, output: Path, timeout: int, memory_limit: int, http_mode: str | None = None, latency: float = 0.0
+):
+    """
+    Execute an example as a notebook (in the worker process), and write the executed notebook and its measurements.
+    With an http_mode, the HTTP requests of the example are counted, recorded or replayed by http_replay.py.
+    """
+    import jupytext
+    import nbformat
+    from nbclient import NotebookClient
+    from nbclient.exceptions import CellExecutionError, DeadKernelError, CellTimeoutError
+
+    # Set before the kernel starts, so the kernel process inherits the limit
+    limit_memory(memory_limit)
+    notebook = jupytext.read(example)
+    notebook.metadata["kernelspec"] = {"name": kernel_name, "display_name": kernel_name, "language": "python"}
+    # The timeout of nbclient applies to every cell, so every cell gets what is left of the time of the example
+    deadline = None
+
+    def remaining_time(cell) -> float:
+        nonlocal deadline
+        if deadline is None:
+            deadline = time.monotonic() + timeout
+        return max(1.0, deadline - time.monotonic())
+
+    # jupyter_client starts the kernel in a session of its own, so it is not stopped together with the worker. The
+    # worker kills the process group of the kernel (with the processes the kernel started) when it is done
+    kernel_group = None
+
+    def remember_kernel(notebook):
+        nonlocal kernel_group
+        kernel_group = getattr(client.km.provisioner, "pgid", None)
+
+    client = NotebookClient(
+        notebook,
+        timeout=timeout,
+        timeout_func=remaining_time,
+        kernel_name=kernel_name,
+        resources={"metadata": {"path": str(example.parent)}},
+        record_timing=True,
+        on_notebook_start=remember_kernel,
+    )
+    setup_cell = None
+    if http_mode:
+        setup_cell = nbformat.v4.new_code_cell("\n".join([
+            "import sys",
+            f"sys.path.insert(0, {str(scripts_dir)!r})",
+            "import http_replay",
+            f"http_replay.install({str(fixtures_dir)!r}, {example_name(example)!r}, {http_mode!r}, "
+            f"{str(output.with_suffix('.http.json'))!r}, {latency!r})",
+        ]))
+        notebook.cells.insert(0, setup_cell)
+
+    status, error = "ok", None
+    start = time.perf_counter()
+    # On SIGTERM (see run_in_worker), nbclient shuts the kernel down, after which the cell fails with DeadKernelError
+    try:
+        client.execute()
+    except CellTimeoutError as e:
+        status, error = "timeout", f"The example did not finish within {timeout}s: {e}"
+    except DeadKernelError as e:
+        status, error = "crashed", str(e)
+    except CellExecutionError as e:
+        status, error = "error", ansi_escape.sub("", str(e))
+    except Exception as e:  # e.g. the kernel did not start
+        status, error = "crashed", f"{type(e).__name__}: {e}"
+    finally:
+        kill_process_group(kernel_group)
+    wall_time = time.perf_counter() - start
+    if setup_cell is not None:
+        notebook.cells.remove(setup_cell)
+
+    # The kernel has exited by now, so its resource usage is included in RUSAGE_CHILDREN
+    usage = resource.getrusage(resource.RUSAGE_SELF) if resource else None
+    kernel_usage = resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
+    nbformat.write(notebook, output)
+    output.with_suffix(".json").write_text(json.dumps({
+        "status": status,
+        "error": error,
+        "wall_time_s": wall_time,
+        "cpu_time_s": usage.ru_utime + usage.ru_stime + kernel_usage.ru_utime + kernel_usage.ru_stime if usage else None,
+        "peak_rss_mb": max(max_rss(usage), max_rss(kernel_usage)) / 2**20 if usage else None,
+        "cells": cell_timings(notebook),
+    }))
+
+
+def store_outputs(notebook_file: Path) -> dict:
+    """
+    Store the executed notebook and the stdout, stderr and figures of its cells, and return their object names.
+    """
+    import nbformat
+
+    notebook = nbformat.read(notebook_file, as_version=4)
+    stdout, stderr, figures = [], [], []
+    for cell in notebook.cells:
+        for output in cell.get("outputs", []):
+            if output.output_type == "stream":
+                (stdout if output.name == "stdout" else stderr).append(output.text)
+            elif output.output_type in ("display_data", "execute_result"):
+                if "image/png" in output.data:
+                    figures.append(store_object(base64.b64decode(output.data["image/png"]), ".png"))
+                elif "image/svg+xml" in output.data:
+                    figures.append(store_object(output.data["image/svg+xml"].encode(), ".svg"))
+    return {
+        "notebook": store_object(notebook_file.read_bytes(), ".ipynb"),
+        "stdout": store_object("".join(stdout).encode(), ".txt"),
+        "stderr": store_object("".join(stderr).encode(), ".txt"),
+        "figures": figures,
+    }
+
+
+def run_in_worker(
+    example: Path,
+    output: Path,
+    timeout: int,
+    memory_limit: int,
+    http_mode: str | None = None,
+    latency: float = 0.0,
+    env: dict | None = None,
+) -> dict:
+    """
+    Run an example in a new worker process, which writes the executed notebook to output, and return its measurements.
+    Environment variables in env are set for the worker and its kernel.
+    """
+    command = [
+        sys.executable, __file__, "--worker", str(example), str(output),
+        "--timeout", str(timeout), "--memory-limit", str(memory_limit),
+    ]
+    if http_mode:
+        command += ["--http", http_mode, "--latency", str(latency)]
+    start = time.perf_counter()
+    # A new session, so the worker can be stopped together with the processes it starts. Its kernel has a session of
+    # its own, which the worker kills itself when it stops
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        start_new_session=True,
+        env={**os.environ, **(env or {})},
+    )
+    timed_out = False
+    try:
+        log, _ = process.communicate(timeout=timeout + startup_grace)
+    except subprocess.TimeoutExpired:
+        # Asked to stop first, so it can stop its kernel, and killed if it does not
+        timed_out = True
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            log, _ = process.communicate(timeout=stop_grace)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            log, _ = process.communicate()
+
+    measurements_file = output.with_suffix(".json")
+    if measurements_file.exists() and not timed_out:
+        result = json.loads(measurements_file.read_text())
+    else:
+        # Stopped, or it crashed before it could write anything (e.g. out of memory)
+        status = "timeout" if timed_out else "crashed"
+        result = {"status": status, "error": log[-2000:], "wall_time_s": time.perf_counter() - start, "cells": []}
+    http_stats_file = output.with_suffix(".http.json")
+    if http_stats_file.exists():
+        result["http"] = json.loads(http_stats_file.read_text())
+    return result
+
+
+def run_example(
+    example: Path,
+    timeout: int,
+    memory_limit: int,
+    force: bool = False,
+    http_mode: str | None = None,
+    latency: float = 0.0,
+) -> dict:
+    """
+    Run an example in a worker process, unless a successful result for it is stored already, and return its result.
+    """
+    key = example_key(example, http_mode)
+    result = load_result(key)
+    # Failures can be transient, e.g. a timeout of the server, so they are not reused
+    if result is not None and result["status"] == "ok" and not force:
+        return {**result, "cached": True}
+
+    name = example.relative_to(examples_dir).as_posix()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = Path(tmp_dir) / "executed.ipynb"
+        result = run_in_worker(example, output, timeout, memory_limit, http_mode, latency)
+        if output.exists():
+            result.update(store_outputs(output))
+
+    result = {"example": name, "key": key, "finished_at": datetime.now().isoformat(timespec="seconds"), **result}
+    save_result(key, result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("examples", nargs="*", help="Examples to run, relative to docs/examples (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of examples run at once")
+    parser.add_argument("--timeout", type=int, default=900, help="Time limit per example, in seconds")
+    parser.add_argument("--memory-limit", type=int, default=4096, help="Memory limit per example in MB, 0 for none")
+    parser.add_argument("--force", action="store_true", help="Also run examples that have a successful stored result")
+    parser.add_argument(
+        "--http",
+        choices=["live", "record", "replay"],
+        help="Count (live), record or replay the HTTP requests of the examples, see http_replay.py",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="With --http replay, wait this many times the recorded response time (default: 0, disk speed)",
+    )
+    parser.add_argument("--worker", nargs=2, metavar=("EXAMPLE", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(Path(args.worker[0]), Path(args.worker[1]), args.timeout, args.memory_limit, args.http, args.latency)
+        return
+
+    examples = find_examples(args.examples)
+    if not examples:
+        sys.exit("No examples found")
+    jobs = max(1, min(args.jobs, len(examples)))
+    print(f"Running {len(examples)} examples with {jobs} workers")
+
+    start = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(jobs) as pool:
+        futures = [
+            pool.submit(run_example, example, args.timeout, args.memory_limit, args.force, args.http, args.latency)
+            for example in examples
+        ]
+        for future in futures:
+            result = future.result()
+            status = "cached" if result.get("cached") else result["status"]
+            peak = f"{result['peak_rss_mb']:.0f} MB" if result.get("peak_rss_mb") else "-"
+            downloaded = f"{format_bytes(result['http']['bytes_downloaded'])} down" if "http" in result else ""
+            print(f"{result['example']:<55} {status:<8} {result['wall_time_s']:>7.1f}s {peak:>8} {downloaded:>14}")
+            if result["status"] != "ok":
+                failed += 1
+                error_lines = (result.get("error") or "").strip().splitlines()
+                if error_lines:
+                    print(f"    {error_lines[-1]}")
+    print(f"Done in {time.perf_counter() - start:.1f}s, {failed} of {len(examples)} examples failed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
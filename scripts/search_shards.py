@@ -0,0 +1,339 @@
+"""
+Split the search index into shards, so the browser only downloads the part of it that a query needs.
+
+Registered as a mkdocs hook (see `hooks` in `mkdocs.yml`). The search plugin writes one search_index.json with the
+full text of every page. Every visitor downloads all of it before the first query, and Material's search worker
+then builds the lunr index from it in the browser. After the build, this hook replaces that file with:
+
+- term shards: a precomputed inverted index, every term with the documents that contain it and their score (BM25 with
+  the field boosts of Material's search). The terms are split by their first letters, into shards of about
+  `term_shard_size` bytes,
+- document shards: the location, title and a short plain text snippet of every document, per section of the site,
+- a manifest of the shards, in the `config` of search_index.json, which Material's search still loads first.
+
+The pages use docs/js/search_worker.js instead of Material's search worker. For a query, it only loads the term shards
+of the first letters of the query terms, and the document shards of the results it shows. Like Material's search,
+terms without `+` or `-` match every term that starts with them, and with the stemmer in the `pipeline` of the search
+plugin, the terms of the index and of the query are reduced to their stem, so "flows" also finds "flow". The shards
+are named by the hash of their content, and have a gzipped copy next to them for web servers that serve precompressed
+files.
+"""
+
+from collections import defaultdict
+from pathlib import Path
+import gzip
+import hashlib
+import html
+import json
+import logging
+import math
+import re
+import shutil
+import time
+
+log = logging.getLogger("mkdocs.plugins.search_shards")
+
+worker_uri = "js/search_worker.js"
+material_worker = re.compile(r"assets/javascripts/workers/search\.[0-9a-f]+\.min\.js")
+shards_uri = "search/shards/"
+manifest_version = 2
+
+# Uncompressed size the shards are filled up to, a shard with a single prefix or page can be larger
+term_shard_size = 32 * 1024
+doc_shard_size = 64 * 1024
+# Terms are split by at most this many first letters
+max_prefix_length = 4
+snippet_length = 240
+
+# Field boosts and BM25 parameters of Material's search worker (which sets b to 0)
+field_boosts = {"title": 1000, "text": 1, "tags": 1000000}
+bm25_k1 = 1.2
+
+# The stop words of lunr, left out when the search plugin uses the stopWordFilter pipeline
+stop_words = set("""
+a able about across after all almost also am among an and any are as at be because been but by can cannot could
+dear did do does either else ever every for from get got had has have he her hers him his how however i if in into
+is it its just least let like likely may me might most must my neither no nor not of off often on only or other our
+own rather said say says she should since so some than that the their them then there these they this tis to too
+twas us wants was we were what when where which while who whom why will with would yet you your
+""".split())
+
+# The Porter stemmer of lunr, used when the search plugin has the stemmer in its pipeline. docs/js/search_worker.js has
+# the same port, the terms of the index and the query terms have to be stemmed alike
+step2_suffixes = {
+    "ational": "ate", "tional": "tion", "enci": "ence", "anci": "ance", "izer": "ize", "bli": "ble", "alli": "al",
+    "entli": "ent", "eli": "e", "ousli": "ous", "ization": "ize", "ation": "ate", "ator": "ate", "alism": "al",
+    "iveness": "ive", "fulness": "ful", "ousness": "ous", "aliti": "al", "iviti": "ive", "biliti": "ble", "logi": "log",
+}
+step3_suffixes = {"icate": "ic", "ative": "", "alize": "al", "iciti": "ic", "ical": "ic", "ful": "", "ness": ""}
+consonants = "[^aeiou][^aeiouy]*"
+vowels = "[aeiouy][aeiou]*"
+measure_gt_0 = re.compile(f"^({consonants})?{vowels}{consonants}")
+measure_eq_1 = re.compile(f"^({consonants})?{vowels}{consonants}({vowels})?$")
+measure_gt_1 = re.compile(f"^({consonants})?{vowels}{consonants}{vowels}{consonants}")
+has_vowel = re.compile(f"^({consonants})?[aeiouy]")
+step1a = re.compile(r"^(.+?)(ss|i)es$")
+step1a_s = re.compile(r"^(.+?)([^s])s$")
+step1b_eed = re.compile(r"^(.+?)eed$")
+step1b = re.compile(r"^(.+?)(ed|ing)$")
+step1b_e = re.compile(r"(at|bl|iz)$")
+double_consonant = re.compile(r"([^aeiouylsz])\1$")
+cvc = re.compile(f"^{consonants}[aeiouy][^aeiouwxy]$")
+step1c = re.compile(r"^(.+?[^aeiou])y$")
+step2 = re.compile(f"^(.+?)({'|'.join(step2_suffixes)})$")
+step3 = re.compile(f"^(.+?)({'|'.join(step3_suffixes)})$")
+step4 = re.compile(r"^(.+?)(al|ance|ence|er|ic|able|ible|ant|ement|ment|ent|ou|ism|ate|iti|ous|ive|ize)$")
+step4_ion = re.compile(r"^(.+?)(s|t)(ion)$")
+step5 = re.compile(r"^(.+?)e$")
+
+tag = re.compile(r"<[^>]*>")
+# Like lunr's trimmer, with JavaScript's (ASCII) notion of a word character
+trim = re.compile(r"^\W+|\W+$", re.ASCII)
+
+# Set per build by on_config
+enabled = False
+
+
+def plain_text(text: str) -> str:
+    return " ".join(html.unescape(tag.sub(" ", text)).split())
+
+
+def tokenize(text: str, separator: re.Pattern) -> list[str]:
+    tokens = (trim.sub("", token.lower()) for token in separator.split(plain_text(text)))
+    return [token for token in tokens if token]
+
+
+def stem(word: str) -> str:
+    """
+    The stem of a word by lunr's Porter stemmer, e.g. "flows" and "flowing" become "flow".
+    """
+    if len(word) < 3:
+        return word
+    # A leading y is a consonant
+    first = word[0]
+    if first == "y":
+        word = "Y" + word[1:]
+
+    if match := step1a.match(word):
+        word = match[1] + match[2]
+    elif match := step1a_s.match(word):
+        word = match[1] + match[2]
+
+    if match := step1b_eed.match(word):
+        if measure_gt_0.search(match[1]):
+            word = word[:-1]
+    elif (match := step1b.match(word)) and has_vowel.search(match[1]):
+        word = match[1]
+        if step1b_e.search(word) or (not double_consonant.search(word) and cvc.search(word)):
+            word += "e"
+        elif double_consonant.search(word):
+            word = word[:-1]
+
+    if match := step1c.match(word):
+        word = match[1] + "i"
+
+    if (match := step2.match(word)) and measure_gt_0.search(match[1]):
+        word = match[1] + step2_suffixes[match[2]]
+
+    if (match := step3.match(word)) and measure_gt_0.search(match[1]):
+        word = match[1] + step3_suffixes[match[2]]
+
+    if match := step4.match(word):
+        if measure_gt_1.search(match[1]):
+            word = match[1]
+    elif (match := step4_ion.match(word)) and measure_gt_1.search(match[1] + match[2]):
+        word = match[1] + match[2]
+
+    if match := step5.match(word):
+        if measure_gt_1.search(match[1]) or (measure_eq_1.search(match[1]) and not cvc.search(match[1])):
+            word = match[1]
+
+    if word.endswith("ll") and measure_gt_1.search(word):
+        word = word[:-1]
+
+    if first == "y":
+        word = "y" + word[1:]
+    return word
+
+
+def snippet(text: str) -> str:
+    text = plain_text(text)
+    if len(text) > snippet_length:
+        text = text[:snippet_length].rsplit(" ", 1)[0] + " …"
+    return f"<p>{html.escape(text, quote=False)}</p>" if text else ""
+
+
+def section(location: str) -> str:
+    return location.split("#")[0].split("/")[0]
+
+
+def content_name(kind: str, data: bytes) -> str:
+    return f"{kind}.{hashlib.sha256(data).hexdigest()[:12]}.json"
+
+
+def json_size(data) -> int:
+    return len(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode())
+
+
+def score_terms(docs: list[dict], config: dict) -> dict[str, list]:
+    """
+    The inverted index of the documents: every term with a flat list of document ids and scores.
+    """
+    separator = re.compile(config["separator"])
+    ignored = stop_words if "stopWordFilter" in config.get("pipeline", []) else set()
+    stemmed = "stemmer" in config.get("pipeline", [])
+    frequencies = []
+    document_frequency = defaultdict(int)
+    for doc in docs:
+        fields = {
+            "title": tokenize(doc["title"], separator),
+            "text": tokenize(doc["text"], separator),
+            "tags": [token for value in doc.get("tags", []) for token in tokenize(value, separator)],
+        }
+        counts = {name: defaultdict(int) for name in fields}
+        for name, tokens in fields.items():
+            for token in tokens:
+                if token not in ignored:
+                    counts[name][stem(token) if stemmed else token] += 1
+        frequencies.append(counts)
+        for term in set().union(*counts.values()):
+            document_frequency[term] += 1
+
+    postings = defaultdict(list)
+    for doc_id, (doc, counts) in enumerate(zip(docs, frequencies)):
+        scores = defaultdict(float)
+        for name, field_counts in counts.items():
+            for term, count in field_counts.items():
+                scores[term] += field_boosts[name] * count * (bm25_k1 + 1) / (count + bm25_k1)
+        for term, score in scores.items():
+            df = document_frequency[term]
+            idf = math.log(1 + abs((len(docs) - df + 0.5) / (df + 0.5)))
+            postings[term] += [doc_id, round(score * idf * doc.get("boost", 1), 2)]
+    return postings
+
+
+def split_terms(postings: dict[str, list], prefix: str = "") -> list[tuple[str, dict]]:
+    """
+    Group the terms that start with prefix by their next letter, and split the groups that are too large further.
+    Returns (prefix, postings) pairs in order; a term is in the group of the longest prefix it starts with.
+    """
+    groups = defaultdict(dict)
+    for term, term_postings in postings.items():
+        groups[term[: len(prefix) + 1]][term] = term_postings
+    leaves = []
+    for key in sorted(groups):
+        group = groups[key]
+        if json_size(group) > term_shard_size and len(key) > len(prefix) and len(key) < max_prefix_length:
+            leaves += split_terms(group, key)
+        else:
+            leaves.append((key, group))
+    return leaves
+
+
+def pack(items: list[tuple], max_size: int) -> list[list[tuple]]:
+    """
+    Pack consecutive (key, data) pairs into shards with at most max_size bytes of data, unless one pair is larger.
+    """
+    shards, shard, shard_size = [], [], 0
+    for item in items:
+        item_size = json_size(item[1])
+        if shard and shard_size + item_size > max_size:
+            shards.append(shard)
+            shard, shard_size = [], 0
+        shard.append(item)
+        shard_size += item_size
+    return shards + [shard] if shard else shards
+
+
+def write_shard(directory: Path, kind: str, data) -> str:
+    content = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+    name = content_name(kind, content)
+    (directory / name).write_bytes(content)
+    (directory / f"{name}.gz").write_bytes(gzip.compress(content, mtime=0))
+    return name
+
+
+def build_shards(index: dict, directory: Path) -> dict:
+    """
+    Write the shards of a search index to directory, and return the manifest.
+    """
+    config = index["config"]
+    # Documents of the same section next to each other, the pages stay in order, followed by their sections
+    docs = sorted(index["docs"], key=lambda doc: section(doc["location"]))
+    # Shards of earlier builds, when the site directory is not cleaned (`mkdocs serve`)
+    shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True)
+
+    pages = {doc["location"]: doc_id for doc_id, doc in enumerate(docs) if "#" not in doc["location"]}
+    # Every page with its sections, per section of the site
+    sections = defaultdict(list)
+    for doc_id, doc in enumerate(docs):
+        entry = [doc["location"], doc["title"], snippet(doc["text"]), pages.get(doc["location"].split("#")[0], -1)]
+        if doc.get("tags"):
+            entry.append(doc["tags"])
+        section_pages = sections[section(doc["location"])]
+        if "#" not in doc["location"] or not section_pages:
+            section_pages.append((doc_id, []))
+        section_pages[-1][1].append(entry)
+    doc_shards = []
+    for section_pages in sections.values():
+        for shard in pack(section_pages, doc_shard_size):
+            entries = [entry for _, page in shard for entry in page]
+            doc_shards.append([shard[0][0], write_shard(directory, "docs", entries)])
+
+    # The shards once, and for every prefix the number of its shard
+    term_files, term_shards = [], {}
+    leaves = split_terms(score_terms(docs, config))
+    for shard in pack(leaves, term_shard_size):
+        terms = {term: data for _, group in shard for term, data in group.items()}
+        term_files.append(write_shard(directory, "terms", terms))
+        term_shards.update((prefix, len(term_files) - 1) for prefix, _ in shard)
+
+    return {
+        "version": manifest_version,
+        "path": shards_uri,
+        "count": len(docs),
+        "stop_words": sorted(stop_words) if "stopWordFilter" in config.get("pipeline", []) else [],
+        "stemmer": "stemmer" in config.get("pipeline", []),
+        "docs": doc_shards,
+        "term_files": term_files,
+        "terms": term_shards,
+    }
+
+
+def on_config(config):
+    global enabled
+    # Material replaces the search plugin with its own, whose worker this replaces
+    enabled = "material/search" in config.plugins
+
+
+def on_post_page(output, page, config):
+    if not enabled:
+        return output
+    return material_worker.sub(worker_uri, output, count=1)
+
+
+def on_post_template(output_content, template_name, config):
+    if not enabled:
+        return output_content
+    return material_worker.sub(worker_uri, output_content, count=1)
+
+
+def on_post_build(config):
+    if not enabled:
+        return
+    site_dir = Path(config.site_dir)
+    index_file = site_dir / "search" / "search_index.json"
+    if not index_file.exists():
+        log.warning("The search plugin did not write a search index, the search does not work")
+        return
+    start = time.perf_counter()
+    index = json.loads(index_file.read_text(encoding="utf-8"))
+    manifest = build_shards(index, site_dir / shards_uri)
+    # Only the config and documents are passed on to the search worker, so the manifest is part of the config
+    data = json.dumps({"config": {**index["config"], "shards": manifest}, "docs": []}, separators=(",", ":"))
+    index_file.write_text(data, encoding="utf-8")
+    log.info(
+        f"Split the search index of {manifest['count']} documents into {len(manifest['term_files'])} "
+        f"term shards and {len(manifest['docs'])} document shards in {time.perf_counter() - start:.1f}s"
+    )
@@ -0,0 +1,35 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+import folder_sync
+
+
+def test_second_sync_touches_nothing(tmp_path):
+    src, dest = tmp_path / "src", tmp_path / "dest"
+    (src / "sub").mkdir(parents=True)
+    (src / "index.md").write_text("# OpenML\n")
+    (src / "usage.md").write_text("usage\n")
+    (src / "sub" / "page.md").write_text("page\n")
+    keep = frozenset({"index.md"})
+
+    assert folder_sync.sync_folder(src, dest, keep) == (2, 0, 0)
+    # Generated by gen_python_ref_pages.py from the source, with a header
+    (dest / "index.md").write_text("---\nicon: material/bookshelf\n---\n\n# OpenML\n")
+
+    assert folder_sync.sync_folder(src, dest, keep) == (0, 0, 0)
+    assert (dest / "index.md").read_text().startswith("---\nicon:")
+
+
+def test_sync_updates_and_removes(tmp_path):
+    src, dest = tmp_path / "src", tmp_path / "dest"
+    src.mkdir()
+    (src / "a.md").write_text("a\n")
+    (src / "b.md").write_text("b\n")
+    folder_sync.sync_folder(src, dest)
+
+    (src / "a.md").write_text("changed\n")
+    (src / "b.md").unlink()
+    assert folder_sync.sync_folder(src, dest) == (0, 1, 1)
+    assert (dest / "a.md").read_text() == "changed\n"
+    assert not (dest / "b.md").exists()
@@ -0,0 +1,32 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+import github_scraper
+
+fixtures_dir = Path(__file__).parent.parent / "scripts" / "fixtures" / "github_pages"
+
+
+def test_star_count():
+    assert github_scraper.star_count("279") == 279
+    assert github_scraper.star_count(" 1,234 ") == 1234
+    assert github_scraper.star_count("1.2k") == 1200
+    assert github_scraper.star_count("3m") == 3_000_000
+    assert github_scraper.star_count("") == 0
+    assert github_scraper.star_count("many") == 0
+
+
+def test_abbreviated_stars_are_parsed_as_a_number():
+    html = (fixtures_dir / "repository_large.html").read_text()
+    assert github_scraper.parse_github_page_fast(html)[2] == "1200"
+    assert github_scraper.parse_github_page_soup(html)[2] == "1200"
+
+
+def test_parsers_agree_on_fixtures():
+    for path in fixtures_dir.glob("*.html"):
+        html = path.read_text()
+        try:
+            expected = github_scraper.parse_github_page_soup(html)
+        except ValueError:
+            expected = None
+        assert github_scraper.parse_github_page_fast(html) == expected, path.name
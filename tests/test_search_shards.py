@@ -0,0 +1,24 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+import search_shards
+
+config = {"lang": ["en"], "separator": r"[\s\-\.]+", "pipeline": ["stemmer", "stopWordFilter"]}
+
+
+def test_stem():
+    # Examples of Porter's paper, as lunr's stemmer stems them
+    words = {
+        "flows": "flow", "flowing": "flow", "caresses": "caress", "ponies": "poni", "agreed": "agre",
+        "hopping": "hop", "filing": "file", "happy": "happi", "relational": "relat", "effective": "effect",
+        "yelling": "yell", "controll": "control", "by": "by",
+    }
+    assert {word: search_shards.stem(word) for word in words} == words
+
+
+def test_terms_are_stemmed_with_the_stemmer_in_the_pipeline():
+    docs = [{"location": "flows/", "title": "Flows", "text": "Running the flows"}]
+    assert set(search_shards.score_terms(docs, config)) == {"flow", "run"}
+    unstemmed = {**config, "pipeline": ["stopWordFilter"]}
+    assert set(search_shards.score_terms(docs, unstemmed)) == {"flows", "running"}